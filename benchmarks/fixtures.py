@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import random
+import zlib
+
+import msgspec
+from aiohttp import web
+from cidex.v2_1 import CacheIndex, Entry, VariantManifest
+
+__all__ = ("FixtureServer", "make_labels")
+
+WORDS = (
+    "client", "bot", "commands", "context", "async", "gather", "task", "event",
+    "loop", "message", "channel", "guild", "member", "user", "embed", "file",
+    "path", "stream", "reader", "writer", "request", "response", "session", "cache",
+    "index", "entry", "manual", "query", "parse", "build", "widget", "window",
+    "array", "matrix", "vector", "frame", "series", "model", "field", "signal",
+)  # fmt: skip
+
+
+def make_labels(count: int, *, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    labels: dict[str, None] = {}
+    while len(labels) < count:
+        depth = rng.randint(1, 4)
+        parts = [rng.choice(WORDS) for _ in range(depth)]
+        parts[-1] = parts[-1].capitalize() if rng.random() < 0.4 else parts[-1]
+        labels[f"{'.'.join(parts)}{len(labels)}"] = None
+    return list(labels)
+
+
+def make_objects_inv(labels: list[str]) -> bytes:
+    directives = ("py:class", "py:function", "py:method", "py:attribute", "std:label")
+    lines = [
+        f"{label} {directives[idx % len(directives)]} {idx % 3 - 1} api/{label.split('.')[0]}.html#$ -"
+        for idx, label in enumerate(labels)
+    ]
+    header = (
+        b"# Sphinx inventory version 2\n"
+        b"# Project: bench\n"
+        b"# Version: 1.0\n"
+        b"# The remainder of this file is compressed using zlib.\n"
+    )
+    return header + zlib.compress(("\n".join(lines) + "\n").encode())
+
+
+def make_mkdocs_index(labels: list[str]) -> bytes:
+    docs = []
+    for idx, label in enumerate(labels):
+        page = f"{label.split('.')[0]}/{idx // 20}/"
+        docs.append(
+            {"location": f"{page}#{label}", "title": label, "text": "lorem " * 60}
+        )
+    return msgspec.json.encode({"config": {"lang": ["en"]}, "docs": docs})
+
+
+def make_gidocgen_index(labels: list[str]) -> bytes:
+    kinds = ("function", "class", "method", "property", "constant")
+    symbols = [
+        {
+            "name": label.rsplit(".", 1)[-1],
+            "summary": "",
+            "type": kinds[idx % len(kinds)],
+            "type_name": label.split(".")[0],
+            "href": f"{label}.html",
+        }
+        for idx, label in enumerate(labels)
+    ]
+    return msgspec.json.encode({"symbols": symbols})
+
+
+def make_cidex_index(labels: list[str]) -> bytes:
+    cache = {
+        label: Entry(label, f"https://bench.invalid/{label}.html") for label in labels
+    }
+    return CacheIndex("bench", None, cache).to_bytes()
+
+
+class FixtureServer:
+    # Serves every fixture for every size under ``/<indexer>/<size>/``. Cidex indexes
+    # live at the host root, so they are served as variants of one manifest instead.
+
+    def __init__(
+        self, sizes: list[int], *, host: str = "127.0.0.1", port: int = 0
+    ) -> None:
+        self.sizes = sizes
+        self.host = host
+        self.port = port
+        self.bytes_served = 0
+        self._files: dict[str, bytes] = {}
+        self._runner: web.AppRunner | None = None
+
+        for size in sizes:
+            labels = make_labels(size, seed=size)
+            self._files[f"/intersphinx/{size}/objects.inv"] = make_objects_inv(labels)
+            self._files[f"/mkdocs/{size}/search/search_index.json"] = make_mkdocs_index(
+                labels
+            )
+            self._files[f"/gidocgen/{size}/index.json"] = make_gidocgen_index(labels)
+            self._files[f"/index-{self.variant(size)}.cidex"] = make_cidex_index(labels)
+
+        manifest = VariantManifest([self.variant(size) for size in sizes])
+        self._files["/index.cidex"] = msgspec.msgpack.encode(manifest)
+
+    @staticmethod
+    def variant(size: int) -> str:
+        # variants are matched as substrings of the url, n1000x isn't part of n10000x
+        return f"n{size}x"
+
+    def base_url(self, indexer: str, size: int) -> str:
+        if indexer == "cidex":
+            return f"http://{self.host}:{self.port}/{self.variant(size)}/docs"
+        return f"http://{self.host}:{self.port}/{indexer}/{size}"
+
+    def file_size(self, path: str) -> int:
+        return len(self._files[path])
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        body = self._files.get("/" + request.path.lstrip("/"))
+        if body is None:
+            return web.Response(status=404)
+
+        self.bytes_served += len(body)
+        return web.Response(body=body)
+
+    async def __aenter__(self) -> FixtureServer:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+
+        if self.port == 0:
+            self.port = self._runner.addresses[0][1]
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
@@ -0,0 +1,247 @@
+"""
+Benchmarks index builds, query latency, memory and reloads against a local server.
+
+    python -m benchmarks.run --sizes 1000 10000 -o results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from yarl import URL
+
+from rtfm_lookup import Manual, RtfmManager
+from rtfm_lookup.enums import IndexerName
+from rtfm_lookup.fuzzy import finder
+from rtfm_lookup.indexers import indexers
+
+from .fixtures import FixtureServer
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+INDEXERS = {
+    "intersphinx": IndexerName.intersphinx,
+    "mkdocs": IndexerName.mkdocs,
+    "gidocgen": IndexerName.gidocgen,
+    "cidex": IndexerName.cidex,
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+def make_queries(labels: list[str], count: int, *, seed: int = 0) -> list[str]:
+    # a mix of what users actually type: prefixes of a name, abbreviated subsequences,
+    # a trailing component on its own and queries that match nothing
+    rng = random.Random(seed)
+    queries = []
+    for idx in range(count):
+        label = rng.choice(labels)
+        match idx % 4:
+            case 0:
+                queries.append(label[: rng.randint(2, max(2, len(label) // 2))])
+            case 1:
+                queries.append("".join(c for c in label if rng.random() < 0.4) or label)
+            case 2:
+                queries.append(label.rsplit(".", 1)[-1])
+            case _:
+                queries.append(rng.choice(["zzqx", "nope_nothing", "qqq.www"]))
+    return queries
+
+
+def new_manual(
+    manager: RtfmManager, server: FixtureServer, indexer: str, size: int
+) -> Manual:
+    return Manual(
+        f"{indexer}-{size}",
+        URL(server.base_url(indexer, size)),
+        indexer=indexers[INDEXERS[indexer]],
+        manager=manager,
+    )
+
+
+async def timed(coro_factory: Callable[[], Awaitable[Any]], repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await coro_factory()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_manual(
+    manager: RtfmManager,
+    server: FixtureServer,
+    indexer: str,
+    size: int,
+    *,
+    repeat: int,
+    queries: int,
+    limit: int,
+) -> dict[str, Any]:
+    result: dict[str, Any] = {"indexer": indexer, "size": size}
+
+    async def build() -> None:
+        await new_manual(manager, server, indexer, size).refresh_cache()
+
+    served = server.bytes_served
+    build_samples = await timed(build, repeat)
+    result["downloaded_bytes"] = (server.bytes_served - served) // repeat
+    result["build"] = summarize(build_samples)
+    result["build"]["entries_per_s"] = size / statistics.median(build_samples)
+
+    # memory is measured in a separate build, tracemalloc slows everything down a lot
+    gc.collect()
+    tracemalloc.start()
+    man = new_manual(manager, server, indexer, size)
+    await man.refresh_cache()
+    await man.get_search_index()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert man.cache is not None
+    result["entries"] = len(man.cache)
+    result["memory"] = {"peak_build_bytes": peak, "resident_bytes": man.memory_usage}
+
+    labels = list(man.cache)
+    query_set = make_queries(labels, queries, seed=size)
+
+    async def run_query(text: str) -> None:
+        async for _ in man.query(text, limit=limit):
+            pass
+
+    samples: list[float] = []
+    for text in query_set:
+        samples.extend(await timed(lambda text=text: run_query(text), 1))
+    result["manual_query"] = summarize(samples)
+
+    finder_samples = []
+    items = list(man.cache.items())
+    for text in query_set:
+        start = time.perf_counter()
+        for _ in finder(text, items, key=lambda t: t[0], limit=limit):
+            pass
+        finder_samples.append(time.perf_counter() - start)
+    result["fuzzy_finder"] = summarize(finder_samples)
+
+    return result
+
+
+async def bench_reload(
+    manager: RtfmManager, server: FixtureServer, size: int, count: int, repeat: int
+) -> dict[str, Any]:
+    for idx in range(count):
+        indexer = list(INDEXERS)[idx % len(INDEXERS)]
+        man = new_manual(manager, server, indexer, size)
+        manager[f"{man.name}-{idx}"] = man
+
+    samples = await timed(manager.reload_cache, repeat)
+    manager.manuals.clear()
+    return {"manuals": count, "size": size, "wall": summarize(samples)}
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> dict[str, Any]:
+    results: dict[str, Any] = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started_at": time.time(),
+        "manuals": [],
+    }
+
+    # the query cache would turn every repeated query into a dict lookup
+    async with (
+        FixtureServer(args.sizes) as server,
+        RtfmManager(query_cache_size=0, parse_executor=args.executor) as manager,
+    ):
+        for indexer in args.indexers:
+            for size in args.sizes:
+                print(f"benchmarking {indexer} with {size} entries", file=sys.stderr)
+                results["manuals"].append(
+                    await bench_manual(
+                        manager,
+                        server,
+                        indexer,
+                        size,
+                        repeat=args.repeat,
+                        queries=args.queries,
+                        limit=args.limit,
+                    )
+                )
+
+        print(f"benchmarking reload of {args.reload_manuals} manuals", file=sys.stderr)
+        results["reload"] = await bench_reload(
+            manager, server, min(args.sizes), args.reload_manuals, args.repeat
+        )
+
+    return results
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark index builds, query latency and memory per indexer.",
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "--indexers", nargs="+", choices=list(INDEXERS), default=list(INDEXERS)
+    )
+    parser.add_argument("--queries", type=int, default=200, help="queries per manual")
+    parser.add_argument("--limit", type=int, default=10, help="results per query")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="builds/reloads per measurement"
+    )
+    parser.add_argument("--reload-manuals", type=int, default=50)
+    parser.add_argument("--executor", choices=["thread", "process"], default=None)
+    parser.add_argument("-o", "--output", type=Path, help="defaults to stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = asyncio.run(main(args))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
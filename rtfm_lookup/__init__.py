@@ -1,4 +1,15 @@
+from .cache_store import *
+from .compact_cache import *
+from .delta import *
 from .enums import *
 from .manager import *
+from .manifest_cache import *
 from .manual import *
+from .metrics import *
+from .mmap_cache import *
+from .query_cache import *
+from .query_session import *
+from .scheduler import *
+from .single_flight import *
+from .snapshot import *
 from .utils import *
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import msgspec
+from cidex.v2_1 import Entry  # noqa: TC002 # for msgspec to resolve
+
+from .compact_cache import CacheColumns, CompactCache
+
+if TYPE_CHECKING:
+    from cidex.v2_1 import Cache
+
+    from .manual import Manual
+
+__all__ = ("CacheStore", "DiskCacheStore")
+
+log = logging.getLogger(__name__)
+
+STORE_VERSION = 2
+
+
+class StoredCache(msgspec.Struct):
+    version: int
+    favicon_url: str | None
+    cache: CacheColumns | dict[str, Entry]
+
+
+stored_encoder = msgspec.msgpack.Encoder()
+stored_decoder = msgspec.msgpack.Decoder(type=StoredCache)
+
+
+class CacheStore(ABC):
+    # read only stores are shared with a builder process, so they are loaded from on
+    # every refresh instead of only when the manual has no cache yet
+    read_only: bool = False
+
+    @abstractmethod
+    async def load(self, manual: Manual) -> Cache | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def save(self, manual: Manual, cache: Cache) -> None:
+        raise NotImplementedError
+
+
+class DiskCacheStore(CacheStore):
+    suffix = ".rtfmcache"
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        ttl: float | None = None,
+        max_size: int | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_size = max_size
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.path=} {self.ttl=} {self.max_size=}>"
+
+    def file_for(self, manual: Manual) -> Path:
+        key = f"{manual.name}\0{manual.loc}\0{manual.indexer.name.value}"
+        digest = hashlib.sha1(key.encode(), usedforsecurity=False).hexdigest()
+        return self.path / f"{digest}{self.suffix}"
+
+    def _is_expired(self, stat: os.stat_result) -> bool:
+        return self.ttl is not None and time.time() - stat.st_mtime > self.ttl
+
+    def _load(self, file: Path) -> StoredCache | None:
+        try:
+            if self._is_expired(file.stat()):
+                file.unlink(missing_ok=True)
+                return None
+            data = stored_decoder.decode(file.read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, msgspec.DecodeError) as e:
+            log.debug("Unable to load cache file %s", file, exc_info=e)
+            return None
+
+        if data.version != STORE_VERSION:
+            return None
+        return data
+
+    def _save(self, file: Path, data: StoredCache) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        tmp = file.with_suffix(".tmp")
+        tmp.write_bytes(stored_encoder.encode(data))
+        os.replace(tmp, file)
+
+        self.evict()
+
+    def evict(self) -> None:
+        files: list[tuple[float, int, Path]] = []
+        for file in self.path.glob(f"*{self.suffix}"):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+
+            if self._is_expired(stat):
+                file.unlink(missing_ok=True)
+            else:
+                files.append((stat.st_mtime, stat.st_size, file))
+
+        if self.max_size is None:
+            return
+
+        total = sum(size for _, size, _ in files)
+        for _, size, file in sorted(files):
+            if total <= self.max_size:
+                break
+            file.unlink(missing_ok=True)
+            total -= size
+
+    async def load(self, manual: Manual) -> Cache | None:
+        data = await asyncio.to_thread(self._load, self.file_for(manual))
+        if data is None:
+            return None
+
+        manual.indexer.favicon_url = data.favicon_url
+        if isinstance(data.cache, CacheColumns):
+            return CompactCache.from_columns(data.cache)
+        return data.cache
+
+    async def save(self, manual: Manual, cache: Cache) -> None:
+        data = StoredCache(
+            STORE_VERSION,
+            manual.favicon_url,
+            cache.to_columns() if isinstance(cache, CompactCache) else dict(cache),
+        )
+        await asyncio.to_thread(self._save, self.file_for(manual), data)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any
+
+import msgspec
+from cidex.v2_1 import Entry
+from yarl import URL
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from cidex.v2_1 import Cache
+
+__all__ = ("CompactCache", "memory_usage")
+
+
+class CacheColumns(msgspec.Struct, array_like=True):
+    base: str | None
+    labels: list[str]
+    locations: list[str]
+    option_ids: bytes
+    option_table: list[dict[str, Any] | None]
+
+
+class CompactCache(Mapping[str, Entry]):
+    # A columnar cache: parallel label/location arrays plus an array of ids into a
+    # table of interned options, instead of an Entry and an options dict per label.
+    # The base url is kept once and every location is relative to it, the full url is
+    # only joined when an entry is actually looked up, since most never are.
+
+    __slots__ = (
+        "_labels",
+        "_locations",
+        "_option_ids",
+        "_option_keys",
+        "_option_table",
+        "_rows",
+        "base",
+    )
+
+    def __init__(self, base: str | URL | None = None) -> None:
+        self.base = URL(base) if isinstance(base, str) else base
+
+        self._rows: dict[str, int] = {}
+        self._labels: list[str] = []
+        self._locations: list[str] = []
+        self._option_ids = array("I")
+        self._option_table: list[dict[str, Any] | None] = [None]
+        self._option_keys: dict[tuple[tuple[str, Any], ...], int] = {}
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.base=} entries={len(self)}>"
+
+    def _intern_options(self, options: dict[str, Any] | None) -> int:
+        if not options:
+            return 0
+
+        key = tuple(options.items())
+        option_id = self._option_keys.get(key)
+        if option_id is None:
+            option_id = self._option_keys[key] = len(self._option_table)
+            self._option_table.append(dict(options))
+        return option_id
+
+    def add(
+        self, label: str, location: str, options: dict[str, Any] | None = None
+    ) -> None:
+        option_id = self._intern_options(options)
+
+        row = self._rows.get(label)
+        if row is None:
+            self._rows[label] = len(self._labels)
+            self._labels.append(label)
+            self._locations.append(location)
+            self._option_ids.append(option_id)
+        else:
+            self._locations[row] = location
+            self._option_ids[row] = option_id
+
+    def url_for(self, location: str) -> str:
+        if self.base is None:
+            return location
+        return str(self.base / location)
+
+    def __getitem__(self, label: str) -> Entry:
+        row = self._rows[label]
+        options = self._option_table[self._option_ids[row]]
+        return Entry(
+            label, self.url_for(self._locations[row]), options=dict(options or {})
+        )
+
+    def __contains__(self, label: object) -> bool:
+        return label in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._labels)
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def diff(self, new: CompactCache) -> tuple[list[str], list[str], list[str]]:
+        # Returns the added, removed and changed labels, comparing the columns
+        # directly instead of materializing an Entry for every label.
+        old_rows, new_rows = self._rows, new._rows
+        added = [label for label in new._labels if label not in old_rows]
+        removed = [label for label in self._labels if label not in new_rows]
+
+        same_base = self.base == new.base
+        changed = []
+        for label, new_row in new_rows.items():
+            old_row = old_rows.get(label)
+            if old_row is None:
+                continue
+
+            old_location, new_location = (
+                self._locations[old_row],
+                new._locations[new_row],
+            )
+            if not same_base:
+                old_location = self.url_for(old_location)
+                new_location = new.url_for(new_location)
+
+            if (
+                old_location != new_location
+                or self._option_table[self._option_ids[old_row]]
+                != new._option_table[new._option_ids[new_row]]
+            ):
+                changed.append(label)
+
+        return added, removed, changed
+
+    def memory_usage(self) -> int:
+        # strings shared between columns are only counted once
+        strings = {
+            id(s): s for column in (self._labels, self._locations) for s in column
+        }
+        return (
+            sum(map(sys.getsizeof, strings.values()))
+            + sys.getsizeof(self._rows)
+            + sys.getsizeof(self._labels)
+            + sys.getsizeof(self._locations)
+            + sys.getsizeof(self._option_ids)
+            + sum(_deep_sizeof(options) for options in self._option_table)
+        )
+
+    def to_columns(self) -> CacheColumns:
+        return CacheColumns(
+            None if self.base is None else str(self.base),
+            self._labels,
+            self._locations,
+            self._option_ids.tobytes(),
+            self._option_table,
+        )
+
+    @classmethod
+    def from_columns(cls, columns: CacheColumns) -> CompactCache:
+        self = cls(columns.base)
+        self._labels = columns.labels
+        self._locations = columns.locations
+        self._option_ids.frombytes(columns.option_ids)
+        self._option_table = columns.option_table
+        self._rows = {label: row for row, label in enumerate(self._labels)}
+        self._option_keys = {
+            tuple(options.items()): option_id
+            for option_id, options in enumerate(self._option_table)
+            if options
+        }
+        return self
+
+
+def _deep_sizeof(obj: Any) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(
+            _deep_sizeof(key) + _deep_sizeof(value) for key, value in obj.items()
+        )
+    elif isinstance(obj, (list, tuple)):
+        size += sum(map(_deep_sizeof, obj))
+    return size
+
+
+def memory_usage(cache: Cache) -> int:
+    # CompactCache, MmapCache and anything else that knows better than we do
+    if (method := getattr(cache, "memory_usage", None)) is not None:
+        return method()
+    return sys.getsizeof(cache) + sum(
+        sys.getsizeof(label)
+        + sys.getsizeof(entry)
+        + sys.getsizeof(entry.text)
+        + sys.getsizeof(entry.url)
+        + _deep_sizeof(entry.options)
+        for label, entry in cache.items()
+    )
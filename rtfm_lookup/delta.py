@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import msgspec
+
+from .compact_cache import CompactCache
+
+if TYPE_CHECKING:
+    from cidex.v2_1 import Cache
+
+__all__ = ("CacheDelta", "diff_caches")
+
+
+class CacheDelta(msgspec.Struct):
+    added: list[str] = msgspec.field(default_factory=list)
+    removed: list[str] = msgspec.field(default_factory=list)
+    changed: list[str] = msgspec.field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    @property
+    def labels(self) -> list[str]:
+        return [*self.added, *self.removed, *self.changed]
+
+
+def diff_caches(old: Cache, new: Cache) -> CacheDelta:
+    if isinstance(old, CompactCache) and isinstance(new, CompactCache):
+        return CacheDelta(*old.diff(new))
+
+    added = [label for label in new if label not in old]
+    removed = [label for label in old if label not in new]
+    changed = [
+        label for label, entry in new.items() if label in old and old[label] != entry
+    ]
+    return CacheDelta(added, removed, changed)
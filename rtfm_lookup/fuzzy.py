@@ -8,6 +8,7 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from __future__ import annotations
 
+import heapq
 import re
 from collections.abc import Callable
 from typing import (
@@ -20,26 +21,82 @@ if TYPE_CHECKING:
 
 T = TypeVar("T")
 
-def finder(
+def pattern(text: str) -> re.Pattern[str]:
+    # Matches the same spans as ``".*?".join(text)``: every character at its first
+    # occurrence after the previous one. The gaps are possessive, so a key that
+    # doesn't match fails right away instead of backtracking through them.
+    parts = [re.escape(text[:1])]
+    for char in text[1:]:
+        char = re.escape(char)
+        parts.append(f"[^{char}\\n]*+{char}")
+    return re.compile("".join(parts), flags=re.IGNORECASE)
+
+
+def score(
     text: str,
     collection: Iterable[T],
     *,
     key: Callable[[T], str] | None = None,
-) -> Iterator[T]:
-    suggestions: list[tuple[int, int, T]] = []
-    text = str(text)
-    pat = ".*?".join(map(re.escape, text))
-    regex = re.compile(pat, flags=re.IGNORECASE)
-    for item in collection:
+) -> Iterator[tuple[int, int, str, int, T]]:
+    regex = pattern(str(text))
+
+    # the searched string and the position are part of the tuple so that ties are
+    # broken the same way ``reversed(sorted(...))`` used to, without ever comparing items
+    for idx, item in enumerate(collection):
         to_search = key(item) if key else str(item)
         r = regex.search(to_search)
         if r:
-            suggestions.append((len(r.group()), r.start(), item))
+            yield r.end() - r.start(), r.start(), to_search, idx, item
+
 
-    def sort_key(tup: tuple[int, int, T]) -> tuple[int, int, str | T]:
-        if key:
-            return tup[0], tup[1], key(tup[2])
-        return tup
+def rank(
+    suggestions: Iterable[tuple[int, int, str, int, T]],
+    *,
+    limit: int | None = None,
+) -> list[T]:
+    if limit is None:
+        ranked = sorted(suggestions, reverse=True)
+    else:
+        ranked = heapq.nlargest(limit, suggestions)
+
+    return [item for *_, item in ranked]
+
+
+def finder(
+    text: str,
+    collection: Iterable[T],
+    *,
+    key: Callable[[T], str] | None = None,
+    limit: int | None = None,
+) -> Iterator[T]:
+    yield from rank(score(text, collection, key=key), limit=limit)
+
+
+def finder_many(
+    texts: Iterable[str],
+    collection: Iterable[T],
+    *,
+    key: Callable[[T], str] | None = None,
+    limit: int | None = None,
+) -> list[list[T]]:
+    # Scores every query in a single pass over the collection, so each item's key is
+    # only computed once. Duplicate queries are only scored once too, results are
+    # returned in the same order as ``texts`` and ranked exactly like ``finder``.
+    texts = [str(text) for text in texts]
+    searches = {
+        text: pattern(text).search
+        for text in dict.fromkeys(texts)
+    }
+    suggestions: dict[str, list[tuple[int, int, str, int, T]]] = {
+        text: [] for text in searches
+    }
+
+    for idx, item in enumerate(collection):
+        to_search = key(item) if key else str(item)
+        for text, search in searches.items():
+            r = search(to_search)
+            if r:
+                suggestions[text].append((r.end() - r.start(), r.start(), to_search, idx, item))
 
-    for _, _, item in reversed(sorted(suggestions, key=sort_key)):
-        yield item
+    ranked = {text: rank(found, limit=limit) for text, found in suggestions.items()}
+    return [ranked[text] for text in texts]
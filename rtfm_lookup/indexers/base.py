@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import logging
+import time
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Any, ClassVar
+from typing import TYPE_CHECKING, Any, ClassVar, TypeVar
+
+from aiohttp import ClientError, ClientTimeout
 
 if TYPE_CHECKING:
     from collections.abc import Awaitable, Callable
@@ -16,6 +20,10 @@ if TYPE_CHECKING:
 
 __all__ = ("Indexer",)
 
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 
 class Indexer(ABC):
     name: ClassVar[IndexerName]
@@ -24,6 +32,7 @@ class Indexer(ABC):
     def __init__(self, manual: Manual) -> None:
         self.manual = manual
         self.favicon_url: str | None = None
+        self._validators: dict[URL, tuple[str | None, str | None]] = {}
 
     def __init_subclass__(cls, name: IndexerName, **kwargs: Any) -> None:
         kwargs["name"] = name
@@ -45,6 +54,89 @@ class Indexer(ABC):
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} {self.manual=} {self.favicon_url=}>"
 
+    def probe_url(self) -> URL | None:
+        return None
+
+    async def probe(self) -> bool | None:
+        # A cheap check of whether this indexer's index exists, used to skip full builds
+        # when auto-detecting. ``None`` means the server couldn't tell us either way.
+        url = self.probe_url()
+        if url is None:
+            return None
+
+        timeout = ClientTimeout(
+            total=self.manual.manager.options.get("probe_timeout", 5)
+        )
+        try:
+            async with self.session.head(
+                url, allow_redirects=True, timeout=timeout
+            ) as res:
+                if res.ok:
+                    return True
+                if res.status in (404, 410):
+                    return False
+        except (ClientError, TimeoutError) as e:
+            log.debug("Unable to probe %s", url, exc_info=e)
+
+    async def fetch(
+        self, url: URL, *, session: ClientSession | None = None
+    ) -> bytes | None:
+        # Returns ``None`` when the server says the file hasn't changed since the
+        # cache we currently hold was built, in which case there is nothing to parse.
+        metrics = self.manual.manager.metrics
+        start = time.perf_counter()
+
+        headers: dict[str, str] = {}
+        if self.manual.cache is not None and url in self._validators:
+            etag, last_modified = self._validators[url]
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        async with (session or self.session).get(url, headers=headers) as res:
+            if res.status == 304:
+                if metrics is not None:
+                    metrics.record(
+                        "fetch",
+                        self.manual.name,
+                        seconds=time.perf_counter() - start,
+                        bytes=0,
+                        not_modified=1,
+                    )
+                return None
+            if not res.ok:
+                raise ValueError(f"Could not get {url} (status {res.status})")
+
+            raw_content = await res.read()
+            self._validators[url] = (
+                res.headers.get("ETag"),
+                res.headers.get("Last-Modified"),
+            )
+
+        if metrics is not None:
+            metrics.record(
+                "fetch",
+                self.manual.name,
+                seconds=time.perf_counter() - start,
+                bytes=len(raw_content),
+            )
+        return raw_content
+
+    async def parse(self, parser: Callable[..., T], *args: Any) -> T:
+        # Parsers are plain module level functions taking bytes, so that they can be
+        # shipped to whatever executor the manager has been configured with.
+        manager = self.manual.manager
+        if manager.metrics is None:
+            return await manager.run_parser(parser, *args)
+
+        start = time.perf_counter()
+        result = await manager.run_parser(parser, *args)
+        manager.metrics.record(
+            "parse", self.manual.name, seconds=time.perf_counter() - start
+        )
+        return result
+
     @abstractmethod
     async def build_cache(self) -> Cache:
         raise NotImplementedError
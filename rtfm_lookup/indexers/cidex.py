@@ -1,15 +1,18 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from abc import abstractmethod
 from typing import TYPE_CHECKING
 
 import msgspec
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientResponseError, ClientSession, ClientTimeout
 from cidex.v2_1 import ApiIndex, ApiRequest, Cache, CacheIndex, VariantManifest
 from yarl import URL
 
 from ..enums import IndexerName
+from ..single_flight import SingleFlight
 from .base import Indexer
 
 if TYPE_CHECKING:
@@ -17,22 +20,44 @@ if TYPE_CHECKING:
 
     from aiohttp import ClientSession
 
+    from ..manual import Manual
+
 log = logging.getLogger(__name__)
 
 CidexResponse = CacheIndex | VariantManifest | ApiIndex
 msgpack = msgspec.msgpack.Decoder(type=CidexResponse)
 api_decoder = msgspec.json.Decoder(type=CacheIndex)
 json_encoder = msgspec.json.Encoder()
+
+
+def decode_index(raw_content: bytes) -> CidexResponse:
+    return msgpack.decode(raw_content)
+
+
 INDEX_URL = "https://github.com/cibere/Rtfm-Indexes/raw/refs/heads/indexes-v2/indexes_v2/{}.cidex"
 
 
 class _CidexIndexerBase(Indexer, name=IndexerName.cidex):
     _api_info: ApiIndex
+    # the index url and the variant that was last resolved from its manifest
+    _variant: tuple[URL, URL] | None = None
+
+    def __init__(self, manual: Manual) -> None:
+        super().__init__(manual)
+        self._in_flight: SingleFlight[str, Cache] = SingleFlight()
 
     @abstractmethod
     def _get_url(self) -> URL:
         raise NotImplementedError
 
+    def probe_url(self) -> URL:
+        return self._get_url()
+
+    async def probe(self) -> bool | None:
+        if self.manual.options.get("file_override"):
+            return True
+        return await super().probe()
+
     def _resolve_variant_via_exact_match(
         self, url: URL, variants: Iterable[str]
     ) -> str | None:
@@ -49,39 +74,97 @@ class _CidexIndexerBase(Indexer, name=IndexerName.cidex):
         # This "proxy" method is used for future-proofing, so that its "easier" to add more matching methods
         return self._resolve_variant_via_exact_match(self.loc, manifest.variants)
 
-    async def fetch_index(
+    def variant_url(self, url: URL, manifest: VariantManifest) -> URL:
+        variant = self.resolve_variant(manifest)
+        if not variant:
+            raise ValueError(
+                f"Unable to resolve correct variant. Variants: {manifest.variants}"
+            )
+        log.debug("Chose the %r variant for the following url: %s", variant, self.loc)
+        return url.with_name(url.name.replace(".cidex", f"-{variant}.cidex"))
+
+    async def _fetch_response(
         self, session: ClientSession, url: URL
-    ) -> CacheIndex | ApiIndex:
-        if self.manual.options.get("file_override"):
-            raw_content = self.manual["file_override"].read_bytes()
-        else:
-            async with session.get(url) as res:
-                raw_content: bytes = await res.content.read()
+    ) -> CidexResponse | None:
+        raw_content = await self.fetch(url, session=session)
+        if raw_content is None:
+            return None
+        return await self.parse(decode_index, raw_content)
 
-        data: CidexResponse = msgpack.decode(raw_content)
+    async def _load_index(
+        self, session: ClientSession, url: URL
+    ) -> CidexResponse | None:
+        # Manifests are shared through the manager. Manuals without a cache make
+        # unconditional requests, so those can share a single request for the index too.
+        manifests = self.manual.manager.manifest_cache
+        if (manifest := manifests.get(url)) is not None:
+            return manifest
+
+        if self.manual.cache is None or manifests.known(url):
+            data = await manifests.load(url, lambda: self._fetch_response(session, url))
+        else:
+            data = await self._fetch_response(session, url)
 
         if isinstance(data, VariantManifest):
-            variant = self.resolve_variant(data)
-            if not variant:
-                raise ValueError(
-                    f"Unable to resolve correct variant. Variants: {data.variants}"
-                )
-            log.debug(
-                "Chose the %r variant for the following url: %s", variant, self.loc
+            manifests.put(url, data)
+        elif data is None and manifests.known(url):
+            # an unchanged manifest says nothing about the variant it points to
+            data = manifests.renew(url)
+        return data
+
+    async def fetch_index(
+        self, session: ClientSession, url: URL
+    ) -> CacheIndex | ApiIndex | None:
+        if self.manual.options.get("file_override"):
+            data: CidexResponse | None = await self.parse(
+                decode_index, self.manual["file_override"].read_bytes()
             )
+        elif (
+            self._variant is not None
+            and self._variant[0] == url
+            and self.manual.manager.manifest_cache.get(url) is None
+        ):
+            # The manifest expired, it's revalidated alongside the variant we resolved
+            # last time, so that an unchanged variant still only costs one round-trip.
+            manifest_data, variant_data = await asyncio.gather(
+                self._load_index(session, url),
+                self._fetch_response(session, self._variant[1]),
+                return_exceptions=True,
+            )
+            if isinstance(manifest_data, BaseException):
+                raise manifest_data
+            data = manifest_data
+            # ``None`` is an unchanged manifest that isn't cached, ex: one restored
+            # from a snapshot, which still points to the variant resolved along with it
+            if data is None or (
+                isinstance(data, VariantManifest)
+                and self.variant_url(url, data) == self._variant[1]
+            ):
+                if isinstance(variant_data, BaseException):
+                    raise variant_data
+                return self._check_index(variant_data)
+        else:
+            data = await self._load_index(session, url)
 
-            parts = list(url.parts)
-            parts[-1] = parts[-1].replace(".cidex", f"-{variant}.cidex")
-            new_url = url.with_path("/".join(parts))
+        if isinstance(data, VariantManifest):
+            new_url = self.variant_url(url, data)
+            self._variant = (url, new_url)
+            return self._check_index(await self._fetch_response(session, new_url))
 
-            assert new_url != url
-            return await self.fetch_index(session, new_url)
+        self._variant = None
+        return data
 
+    def _check_index(self, data: CidexResponse | None) -> CacheIndex | ApiIndex | None:
+        if isinstance(data, VariantManifest):
+            raise ValueError("A variant of a manifest can't be another manifest")
         return data
 
     async def build_cache(self) -> Cache:
         url = self._get_url()
         index = await self.fetch_index(self.session, url)
+        if index is None:
+            assert self.manual.cache is not None
+            return self.manual.cache
 
         if isinstance(index, ApiIndex):
             self._api_info = index
@@ -94,15 +177,55 @@ class _CidexIndexerBase(Indexer, name=IndexerName.cidex):
         return cache
 
     async def _make_request(self, query: str) -> Cache:
-        info = self._api_info
+        # identical queries that are already in flight share the same request
+        return await self._in_flight.run(query, lambda: self._send_request(query))
 
-        payload = ApiRequest(query=query, options=info.options)
-        async with self.session.post(
-            info.url, data=json_encoder.encode(payload)
-        ) as res:
-            raw_content = await res.read()
-
-        return api_decoder.decode(raw_content).cache
+    async def _send_request(self, query: str) -> Cache:
+        info = self._api_info
+        options = self.manual.manager.options
+
+        retries: int = options.get("api_retries", 2)
+        backoff: float = options.get("api_retry_backoff", 0.5)
+        timeout = ClientTimeout(total=options.get("api_timeout", 10))
+
+        metrics = self.manual.manager.metrics
+        start = time.perf_counter()
+
+        payload = json_encoder.encode(ApiRequest(query=query, options=info.options))
+        attempt = 0
+        while True:
+            try:
+                async with self.session.post(
+                    info.url, data=payload, timeout=timeout
+                ) as res:
+                    res.raise_for_status()
+                    raw_content = await res.read()
+            except (ClientError, TimeoutError) as e:
+                retryable = not isinstance(e, ClientResponseError) or (
+                    e.status >= 500 or e.status == 429
+                )
+                if not retryable or attempt == retries:
+                    if metrics is not None:
+                        metrics.record(
+                            "api_request",
+                            self.manual.name,
+                            seconds=time.perf_counter() - start,
+                            errors=1,
+                        )
+                    raise
+
+                log.debug("Retrying api request to %s", info.url, exc_info=e)
+                await asyncio.sleep(backoff * 2**attempt)
+                attempt += 1
+            else:
+                if metrics is not None:
+                    metrics.record(
+                        "api_request",
+                        self.manual.name,
+                        seconds=time.perf_counter() - start,
+                        retries=attempt,
+                    )
+                return api_decoder.decode(raw_content).cache
 
 
 class CibereRtfmIndex(_CidexIndexerBase, name=IndexerName.cibere_rtfm_indexes):
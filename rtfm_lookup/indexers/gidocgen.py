@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
 import msgspec
-from cidex.v2_1 import (
-    Entry,  # this will be fixed in the next ruff release
-    MutableCache,
-)
 
+from ..compact_cache import CompactCache
 from ..enums import IndexerName
 from .base import Indexer
 
+if TYPE_CHECKING:
+    from cidex.v2_1 import Cache
+    from yarl import URL
+
 TYPE_REPLACEMENTS = {
     "record": "struct",
     "constant": "const",
@@ -53,19 +56,27 @@ class GiDocGenIndex(msgspec.Struct):
 index_decoder = msgspec.json.Decoder(type=GiDocGenIndex)
 
 
-class GidocgenDocType(Indexer, name=IndexerName.gidocgen):
-    async def build_cache(self) -> MutableCache:
-        async with self.session.get(self / "index.json") as res:
-            raw_content: bytes = await res.content.read()
+def parse_index(raw_content: bytes, loc: str) -> CompactCache:
+    data = index_decoder.decode(raw_content)
+    cache = CompactCache(loc)
+
+    for entry in data.symbols:
+        label = entry.build_label()
+        href = entry.href or f"{label}.html"
 
-        data = index_decoder.decode(raw_content)
-        cache: MutableCache = {}
+        cache.add(label, href)
 
-        for entry in data.symbols:
-            label = entry.build_label()
-            href = entry.href or f"{label}.html"
-            url = self / href
+    return cache
+
+
+class GidocgenDocType(Indexer, name=IndexerName.gidocgen):
+    def probe_url(self) -> URL:
+        return self / "index.json"
 
-            cache[label] = Entry(label, str(url))
+    async def build_cache(self) -> Cache:
+        raw_content = await self.fetch(self.probe_url())
+        if raw_content is None:
+            assert self.manual.cache is not None
+            return self.manual.cache
 
-        return cache
+        return await self.parse(parse_index, raw_content, str(self.loc))
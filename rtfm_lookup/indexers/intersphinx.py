@@ -5,13 +5,11 @@ https://github.com/Rapptz/RoboDanny/blob/rewrite/cogs/api.py
 
 from __future__ import annotations
 
-import io
 import re
 import zlib
 from typing import TYPE_CHECKING
 
-from cidex.v2_1 import Entry, MutableCache
-
+from ..compact_cache import CompactCache
 from ..enums import IndexerName
 from ..utils import remove_page_path
 from .base import Indexer
@@ -21,40 +19,67 @@ if TYPE_CHECKING:
     from pathlib import Path
 
     from aiohttp import ClientSession
+    from cidex.v2_1 import Cache
     from yarl import URL
 
+# This code mostly comes from the Sphinx repository.
+# It's matched against whole blocks of lines at once, so unlike the original ``\s`` can't
+# be allowed to match newlines, and the trailing whitespace is stripped by the pattern.
+entry_regex = re.compile(
+    r"(?m)^(.+?)[^\S\n]+(\S*:\S*)[^\S\n]+(-?\d+)[^\S\n]+(\S+)[^\S\n]+(\S.*?)[^\S\n]*$"
+)
+
 
 class SphinxObjectFileReader:
     # Inspired by Sphinx's InventoryFileReader
     BUFSIZE = 16 * 1024
 
     def __init__(self, buffer: bytes) -> None:
-        self.stream = io.BytesIO(buffer)
+        self.buffer = buffer
+        self.pos = 0
+
+    def _readline(self) -> bytes:
+        end = self.buffer.find(b"\n", self.pos)
+        end = len(self.buffer) if end == -1 else end + 1
+
+        line = self.buffer[self.pos : end]
+        self.pos = end
+        return line
 
     def readline(self) -> str:
-        return self.stream.readline().decode("utf-8")
+        return self._readline().decode("utf-8")
 
     def skipline(self) -> None:
-        self.stream.readline()
+        self._readline()
 
     def read_compressed_chunks(self) -> Generator[bytes]:
+        # the compressed data is only ever viewed, and decompressed one piece at a time
         decompressor = zlib.decompressobj()
-        while True:
-            chunk = self.stream.read(self.BUFSIZE)
-            if len(chunk) == 0:
-                break
-            yield decompressor.decompress(chunk)
+        view = memoryview(self.buffer)
+        for offset in range(self.pos, len(view), self.BUFSIZE):
+            yield decompressor.decompress(view[offset : offset + self.BUFSIZE])
         yield decompressor.flush()
 
-    def read_compressed_lines(self) -> Generator[str]:
-        buf = b""
+    def read_compressed_blocks(self) -> Generator[str]:
+        # Yields runs of complete lines. Only the trailing partial line of a chunk is
+        # carried over to the next one, so every byte is copied a bounded number of times.
+        pending = b""
         for chunk in self.read_compressed_chunks():
-            buf += chunk
-            pos = buf.find(b"\n")
-            while pos != -1:
-                yield buf[:pos].decode("utf-8")
-                buf = buf[pos + 1 :]
-                pos = buf.find(b"\n")
+            data = pending + chunk if pending else chunk
+            end = data.rfind(b"\n") + 1
+            if end:
+                yield data[:end].decode("utf-8")
+            pending = data[end:]
+
+        if pending:
+            yield pending.decode("utf-8")
+
+    def read_compressed_lines(self) -> Generator[str]:
+        for block in self.read_compressed_blocks():
+            lines = block.split("\n")
+            if block.endswith("\n"):
+                lines.pop()
+            yield from lines
 
     @classmethod
     async def from_url(
@@ -76,39 +101,33 @@ class SphinxObjectFileReader:
         return cls(path.read_bytes())
 
 
-class InterSphinx(Indexer, name=IndexerName.intersphinx):
-    async def build_cache(self) -> MutableCache:
-        file = await SphinxObjectFileReader.from_url(
-            remove_page_path(self.loc), session=self.session
-        )
+def parse_inventory(raw_content: bytes, loc: str) -> CompactCache:
+    file = SphinxObjectFileReader(raw_content)
 
-        cache: MutableCache = {}
+    cache = CompactCache(loc)
+    # there are only a handful of distinct directive/priority pairs
+    subs: dict[tuple[str, str], dict[str, str]] = {}
 
-        # first line is version info
-        inv_version = file.readline().rstrip()
+    # first line is version info
+    inv_version = file.readline().rstrip()
 
-        if inv_version != "# Sphinx inventory version 2":
-            raise RuntimeError("Invalid objects.inv file version.")
+    if inv_version != "# Sphinx inventory version 2":
+        raise RuntimeError("Invalid objects.inv file version.")
 
-        # next line is "# Project: <name>"
-        # then after that is "# Version: <version>"
-        file.readline().rstrip()[11:]
-        file.readline().rstrip()[11:]
+    # next line is "# Project: <name>"
+    # then after that is "# Version: <version>"
+    file.readline().rstrip()[11:]
+    file.readline().rstrip()[11:]
 
-        # next line says if it's a zlib header
-        line = file.readline()
-        if "zlib" not in line:
-            raise RuntimeError(
-                f"Invalid objects.inv file, not z-lib compatible. Line: {line}"
-            )
-
-        # This code mostly comes from the Sphinx repository.
-        entry_regex = re.compile(r"(?x)(.+?)\s+(\S*:\S*)\s+(-?\d+)\s+(\S+)\s+(.*)")
-        for line in file.read_compressed_lines():
-            match = entry_regex.match(line.rstrip())
-            if not match:
-                continue
+    # next line says if it's a zlib header
+    line = file.readline()
+    if "zlib" not in line:
+        raise RuntimeError(
+            f"Invalid objects.inv file, not z-lib compatible. Line: {line}"
+        )
 
+    for block in file.read_compressed_blocks():
+        for match in entry_regex.finditer(block):
             name, directive, prio, location, dispname = match.groups()
             domain, _, subdirective = directive.partition(":")
             if directive == "py:module" and name in cache:
@@ -127,15 +146,29 @@ class InterSphinx(Indexer, name=IndexerName.intersphinx):
                 location = location[:-1] + name
 
             key = name if dispname == "-" else dispname
-            url = self / location
 
             prefix = f"{subdirective}:" if domain == "std" else ""
             label = f"{prefix}{key}"
 
-            cache[label] = Entry(
-                label,
-                str(url),
-                options={"sub": f"{directive} | priority: {prio}"},
-            )
+            options = subs.get((directive, prio))
+            if options is None:
+                options = subs[directive, prio] = {
+                    "sub": f"{directive} | priority: {prio}"
+                }
+
+            cache.add(label, location, options)
+
+    return cache
+
+
+class InterSphinx(Indexer, name=IndexerName.intersphinx):
+    def probe_url(self) -> URL:
+        return remove_page_path(self.loc) / "objects.inv"
+
+    async def build_cache(self) -> Cache:
+        raw_content = await self.fetch(self.probe_url())
+        if raw_content is None:
+            assert self.manual.cache is not None
+            return self.manual.cache
 
-        return cache
+        return await self.parse(parse_inventory, raw_content, str(self.loc))
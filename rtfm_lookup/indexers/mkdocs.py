@@ -1,34 +1,64 @@
 from __future__ import annotations
 
+from collections import Counter
+from typing import TYPE_CHECKING
+
 import msgspec
-from cidex.v2_1 import Entry, MutableCache
 
+from ..compact_cache import CompactCache
 from ..enums import IndexerName
 from .base import Indexer
 
+if TYPE_CHECKING:
+    from cidex.v2_1 import Cache
+    from yarl import URL
+
+
+# ``text`` (the whole page or section) and ``config`` make up most of the file but are
+# never used, leaving them out of the structs lets msgspec skip over them without
+# allocating anything for them.
+
 
 class DocEntry(msgspec.Struct):
     location: str
-    text: str
     title: str
 
 
 class SearchIndexFile(msgspec.Struct):
-    config: dict
     docs: list[DocEntry]
 
 
 search_file_decoder = msgspec.json.Decoder(type=SearchIndexFile)
 
 
+def parse_search_index(raw_content: bytes, loc: str) -> CompactCache:
+    docs = search_file_decoder.decode(raw_content).docs
+
+    # Every page has an entry, followed by one per section (``page/#anchor``). Section
+    # titles like "Usage" are shared by lots of pages and would overwrite each other,
+    # so those are prefixed with the title of their page.
+    pages = {entry.location: entry.title for entry in docs if "#" not in entry.location}
+    titles = Counter(entry.title for entry in docs)
+
+    cache = CompactCache(loc)
+    for entry in docs:
+        label = entry.title
+        if titles[label] > 1 and "#" in entry.location:
+            page = pages.get(entry.location.partition("#")[0])
+            if page and page != label:
+                label = f"{page} > {label}"
+        cache.add(label, entry.location)
+    return cache
+
+
 class Mkdocs(Indexer, name=IndexerName.mkdocs):
-    async def build_cache(self) -> MutableCache:
-        async with self.session.get(self / "search" / "search_index.json") as res:
-            raw_content: bytes = await res.content.read()
+    def probe_url(self) -> URL:
+        return self / "search" / "search_index.json"
 
-        data = search_file_decoder.decode(raw_content)
+    async def build_cache(self) -> Cache:
+        raw_content = await self.fetch(self.probe_url())
+        if raw_content is None:
+            assert self.manual.cache is not None
+            return self.manual.cache
 
-        return {
-            entry.title: Entry(entry.title, str(self / entry.location))
-            for entry in data.docs
-        }
+        return await self.parse(parse_search_index, raw_content, str(self.loc))
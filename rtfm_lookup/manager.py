@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
 import logging
-from typing import TYPE_CHECKING, Any, Literal, Self
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Literal, Self, TypeVar
 
 import aiohttp
 import msgspec
@@ -10,22 +13,39 @@ from yarl import URL
 
 from .filler import Filler
 from .fuzzy import finder as _fuzzy_finder
+from .fuzzy import finder_many as _fuzzy_finder_many
 from .indexers import indexers
+from .manifest_cache import ManifestCache
 from .manual import Manual, PartialManual
+from .metrics import Metrics
+from .mmap_cache import MmapCache
+from .query_cache import QueryCache
+from .scheduler import ReloadScheduler
+from .search_index import SearchIndex
+from .snapshot import Snapshot
 from .utils import ManualsIterable
 
 if TYPE_CHECKING:
-    from collections.abc import Generator, Iterator
+    from collections.abc import (
+        AsyncIterator,
+        Callable,
+        Generator,
+        Iterable,
+        Iterator,
+    )
     from types import TracebackType
 
     from cidex.v2_1 import Cache, Entry
 
     from .enums import IndexerName
+    from .scheduler import ReloadResult
 
 __all__ = ("RtfmManager",)
 
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class RtfmManager:
     _session: aiohttp.ClientSession
@@ -36,6 +56,36 @@ class RtfmManager:
             "Rtfm Manager has not been initialized yet. You can do so by using it as a context manager, or awaiting the manager."
         )  # pyright: ignore[reportAttributeAccessIssue]
         self.options = options
+        self.reload_scheduler = ReloadScheduler(
+            concurrency=options.get("reload_concurrency", 8),
+            per_host=options.get("reload_per_host", 2),
+        )
+        self._periodic_reload: asyncio.Task[None] | None = None
+        self._detected_indexers: dict[str, IndexerName] = {}
+        self._pending_loads: list[Manual] = []
+        self._loading: set[asyncio.Task[list[ReloadResult]]] = set()
+        self.manifest_cache = ManifestCache(ttl=options.get("manifest_ttl", 3600))
+        self.query_cache = QueryCache(
+            maxsize=options.get("query_cache_size", 1024),
+            ttl=options.get("query_cache_ttl", 300),
+            max_results=options.get("query_cache_max_results", 1000),
+            max_delta=options.get("query_cache_max_delta", 1000),
+        )
+
+        # ``True`` is a shortcut for a fresh Metrics instance, ``None`` disables them
+        metrics = options.get("metrics")
+        self.metrics: Metrics | None = Metrics() if metrics is True else metrics
+
+        executor = options.get("parse_executor")
+        self._owns_parse_executor = isinstance(executor, str)
+        match executor:
+            case "thread":
+                executor = ThreadPoolExecutor(
+                    options.get("parse_workers"), thread_name_prefix="rtfm-parse"
+                )
+            case "process":
+                executor = ProcessPoolExecutor(options.get("parse_workers"))
+        self.parse_executor: Executor | None = executor
 
     @property
     def manuals(self) -> ManualsIterable:
@@ -45,10 +95,30 @@ class RtfmManager:
         return self.__aenter__().__await__()
 
     async def close(self):
+        self.stop_periodic_reload()
+        for task in self._loading:
+            task.cancel()
+        if self._owns_parse_executor and self.parse_executor is not None:
+            self.parse_executor.shutdown(wait=False, cancel_futures=True)
         await self._session.close()
 
     async def __aenter__(self) -> Self:
-        self._session = await aiohttp.ClientSession().__aenter__()
+        connector_options = {
+            argument: self.options[option]
+            for option, argument in (
+                ("connector_limit", "limit"),
+                ("connector_limit_per_host", "limit_per_host"),
+                ("keepalive_timeout", "keepalive_timeout"),
+                ("dns_cache_ttl", "ttl_dns_cache"),
+            )
+            if option in self.options
+        }
+        connector = aiohttp.TCPConnector(**connector_options)
+        self._session = await aiohttp.ClientSession(connector=connector).__aenter__()
+
+        if self._pending_loads:
+            self.load_manuals(self._pending_loads)
+            self._pending_loads = []
         return self
 
     async def __aexit__(
@@ -60,21 +130,133 @@ class RtfmManager:
         return await self.close()
 
     def __setitem__(self, key: str, value: Manual) -> None:
+        if (old := self._manuals.get(key)) is not None:
+            self.query_cache.invalidate(old)
+
         self._manuals[key] = value
         value.name = key
 
     def __getitem__(self, key: str) -> Manual:
         return self._manuals.__getitem__(key)
 
-    def fuzzy_search(self, text: str, cache: Cache) -> Iterator[tuple[str, Entry]]:
-        return _fuzzy_finder(text, list(cache.items()), key=lambda t: t[0])
+    async def run_parser(self, parser: Callable[..., T], *args: Any) -> T:
+        # ``None`` falls back to the loop's default thread pool
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.parse_executor, parser, *args)
+
+    def fuzzy_search(
+        self,
+        text: str,
+        cache: Cache | SearchIndex | MmapCache,
+        *,
+        limit: int | None = None,
+    ) -> Iterator[tuple[str, Entry]]:
+        if isinstance(cache, (SearchIndex, MmapCache)):
+            return cache.search(text, limit=limit)
+        return _fuzzy_finder(text, list(cache.items()), key=lambda t: t[0], limit=limit)
+
+    def fuzzy_search_many(
+        self,
+        texts: Iterable[str],
+        cache: Cache | SearchIndex | MmapCache,
+        *,
+        limit: int | None = None,
+    ) -> list[list[tuple[str, Entry]]]:
+        if isinstance(cache, SearchIndex):
+            return cache.search_many(texts, limit=limit)
+        if isinstance(cache, MmapCache):
+            return [list(cache.search(text, limit=limit)) for text in texts]
+        return _fuzzy_finder_many(
+            texts, list(cache.items()), key=lambda t: t[0], limit=limit
+        )
 
-    async def reload_cache(self) -> None:
-        await asyncio.gather(*(man.refresh_cache() for man in self._manuals.values()))
+    async def query_all(
+        self,
+        text: str,
+        *,
+        manuals: Iterable[Manual | str] | None = None,
+        limit: int | None = None,
+        timeout: float | None = None,
+    ) -> AsyncIterator[tuple[Manual, int, Entry]]:
+        if manuals is None:
+            targets = list(self._manuals.values())
+        else:
+            targets = [self[man] if isinstance(man, str) else man for man in manuals]
+
+        if timeout is None:
+            timeout = self.options.get("query_timeout")
+
+        async def collect(man: Manual) -> list[tuple[int, Entry]]:
+            async with asyncio.timeout(timeout):
+                return [result async for result in man.query(text, limit=limit)]
+
+        tasks = {
+            asyncio.create_task(collect(man)): pos for pos, man in enumerate(targets)
+        }
+        pending = set(tasks)
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                # manuals that finish together are interleaved by their own ranking,
+                # so the best match of every manual comes before anyone's second best
+                batches = []
+                for task in done:
+                    man = targets[tasks[task]]
+                    try:
+                        results = task.result()
+                    except Exception as e:
+                        log.debug("Querying %r failed", man.name, exc_info=e)
+                        continue
+
+                    batches.append(
+                        [(idx, tasks[task], man, entry) for idx, entry in results]
+                    )
+
+                for idx, _, man, entry in heapq.merge(
+                    *batches, key=lambda r: (r[0], r[1])
+                ):
+                    yield man, idx, entry
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def reload_cache(
+        self, manuals: Iterable[Manual] | None = None
+    ) -> list[ReloadResult]:
+        if manuals is None:
+            manuals = self._manuals.values()
+        return await self.reload_scheduler.run(manuals)
 
     def trigger_cache_reload(self) -> None:
         asyncio.create_task(self.reload_cache())
 
+    async def _reload_periodically(self, interval: float, jitter: float) -> None:
+        while True:
+            # jitter keeps several processes started together from reloading in lockstep
+            await asyncio.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+
+            results = await self.reload_cache()
+            if failed := [result.name for result in results if not result.ok]:
+                log.warning("Unable to reload the following manuals: %s", failed)
+
+    def start_periodic_reload(
+        self, interval: float, *, jitter: float = 0.1
+    ) -> asyncio.Task[None]:
+        self.stop_periodic_reload()
+        self._periodic_reload = asyncio.create_task(
+            self._reload_periodically(interval, jitter)
+        )
+        return self._periodic_reload
+
+    def stop_periodic_reload(self) -> None:
+        if self._periodic_reload is not None:
+            self._periodic_reload.cancel()
+            self._periodic_reload = None
+
     async def get_manual(
         self,
         name: str,
@@ -94,11 +276,20 @@ class RtfmManager:
         if options:
             kwargs["options"] = options
 
-        for indexer in indexers.values():
-            if indexer_name and indexer.name is not indexer_name:
-                continue
-
-            man = Manual(indexer=indexer, **kwargs)
+        candidates = [
+            Manual(indexer=indexer, **kwargs)
+            for indexer in indexers.values()
+            if not indexer_name or indexer.name is indexer_name
+        ]
+        if len(candidates) > 1:
+            detected = await self._detect_indexers(url, candidates)
+            if not detected and raise_error:
+                # every index is missing, the first candidate is still built so that
+                # there is an error to raise
+                detected = candidates[:1]
+            candidates = detected
+
+        for man in candidates:
             try:
                 await man.refresh_cache()
             except Exception as e:
@@ -106,12 +297,27 @@ class RtfmManager:
 
                 if getattr(e, "__rtfm_lookup_force_raise__", False) or raise_error:
                     raise e
-                del man
             else:
+                self._detected_indexers[str(url)] = man.indexer.name
                 if add:
-                    self[man.name] = man  # noqa: F821 # false positive: https://github.com/astral-sh/ruff/issues/6242
+                    self[man.name] = man
+
+                return man
 
-                return man  # noqa: F821 # false positive: https://github.com/astral-sh/ruff/issues/6242
+    async def _detect_indexers(
+        self, url: URL, candidates: list[Manual]
+    ) -> list[Manual]:
+        # Orders the candidates so that only the right indexer has to do a full build.
+        # Found indexers come first, then the ones the server couldn't give an answer
+        # for, while indexers whose index is definitely missing are dropped.
+        detected = self._detected_indexers.get(str(url))
+        if detected is not None:
+            return sorted(candidates, key=lambda man: man.indexer.name is not detected)
+
+        probes = await asyncio.gather(*(man.indexer.probe() for man in candidates))
+        found = [man for man, probe in zip(candidates, probes) if probe]
+        unknown = [man for man, probe in zip(candidates, probes) if probe is None]
+        return found + unknown
 
     def export(self, format: Literal["json", "yaml", "msgpack"] = "json") -> bytes:
         match format:
@@ -141,16 +347,23 @@ class RtfmManager:
                 decoder = msgspec.msgpack.decode
 
         partial_manuals = decoder(data, type=list[PartialManual])
-
-        for partial_manual in partial_manuals:
-            man = Manual(
-                partial_manual.name,
-                URL(partial_manual.loc),
-                indexer=indexers[partial_manual.type],
-                manager=self,
-                options=partial_manual.options,
-            )
-            self[man.name] = man
+        self.load_partials(*partial_manuals)
+
+    def export_snapshot(self, *, indexes: bool = False) -> bytes:
+        # Unlike ``export``, this includes every cache that has been built so far, and
+        # optionally their search indexes, so that importing it needs no network.
+        return Snapshot.from_manuals(self._manuals.values(), indexes=indexes).encode()
+
+    def import_snapshot(self, data: bytes | memoryview, *, lazy: bool = True) -> None:
+        # ``data`` can be a memoryview of an mmap'd file, lazily loaded manuals keep
+        # referencing it until they are first used.
+        snapshot = Snapshot.decode(data)
+        manuals = []
+        for manual_snapshot in snapshot.manuals:
+            man = self.load_partial(manual_snapshot.manual)
+            man.load_snapshot(manual_snapshot, lazy=lazy)
+            manuals.append(man)
+        self._apply_load_policy(manuals)
 
     def load_partial(self, partial: PartialManual, *, add: bool = True) -> Manual:
         man = Manual(
@@ -160,11 +373,50 @@ class RtfmManager:
             manager=self,
             options=partial.options,
         )
+        man.query_count = partial.query_count
 
         if add:
             self[man.name] = man
         return man
 
     def load_partials(self, *partials: PartialManual) -> None:
-        for partial in partials:
-            self.load_partial(partial)
+        self._apply_load_policy([self.load_partial(partial) for partial in partials])
+
+    def _apply_load_policy(self, manuals: list[Manual]) -> None:
+        # "lazy" leaves manuals to be loaded by their first query. The others start
+        # loading right away, or once the manager is started if it isn't yet.
+        if self.options.get("load_policy", "lazy") == "lazy":
+            return
+
+        if isinstance(self._session, Filler):
+            # a running loop doesn't mean the manager was started, ex: a manager
+            # created and filled inside of ``main`` before ``async with`` is reached
+            self._pending_loads.extend(manuals)
+            return
+
+        self.load_manuals(manuals)
+
+    def load_manuals(
+        self, manuals: Iterable[Manual] | None = None
+    ) -> asyncio.Task[list[ReloadResult]]:
+        # Loads every manual that has no cache yet in the background, following the
+        # ``load_policy`` option. "eager" loads them all at once, within the reload
+        # limits, while "prewarm" loads them a few at a time, most queried first.
+        # Queries don't wait for their turn, they load their manual themselves.
+        targets = [
+            man
+            for man in (self._manuals.values() if manuals is None else manuals)
+            if man.cache is None
+        ]
+
+        if self.options.get("load_policy", "lazy") == "prewarm":
+            coro = self.reload_scheduler.prewarm(
+                targets, concurrency=self.options.get("prewarm_concurrency", 2)
+            )
+        else:
+            coro = self.reload_scheduler.run(targets)
+
+        task = asyncio.create_task(coro)
+        self._loading.add(task)
+        task.add_done_callback(self._loading.discard)
+        return task
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from .single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from cidex.v2_1 import VariantManifest
+    from yarl import URL
+
+__all__ = ("ManifestCache",)
+
+T = TypeVar("T")
+
+
+class ManifestCache:
+    # Cidex variant manifests by url, shared by every manual whose index lives there.
+    # Ex: every manual of the shared rtfm indexes repo hosted on the same domain.
+
+    def __init__(self, *, ttl: float | None = 3600) -> None:
+        self.ttl = ttl
+
+        self._manifests: dict[URL, tuple[float, VariantManifest]] = {}
+        self._in_flight: SingleFlight[URL, Any] = SingleFlight()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.ttl=} size={len(self._manifests)}>"
+
+    def __len__(self) -> int:
+        return len(self._manifests)
+
+    def known(self, url: URL) -> bool:
+        return url in self._manifests
+
+    def get(self, url: URL) -> VariantManifest | None:
+        # expired manifests are kept around, to be renewed when they haven't changed
+        cached = self._manifests.get(url)
+        if cached is None or (
+            self.ttl is not None and time.monotonic() - cached[0] > self.ttl
+        ):
+            return None
+        return cached[1]
+
+    def put(self, url: URL, manifest: VariantManifest) -> None:
+        self._manifests[url] = (time.monotonic(), manifest)
+
+    def renew(self, url: URL) -> VariantManifest:
+        manifest = self._manifests[url][1]
+        self.put(url, manifest)
+        return manifest
+
+    async def load(self, url: URL, loader: Callable[[], Awaitable[T]]) -> T:
+        # concurrent loads of the same url share a single request
+        return await self._in_flight.run(url, loader)
+
+    def invalidate(self, url: URL | None = None) -> None:
+        if url is None:
+            self._manifests.clear()
+        else:
+            self._manifests.pop(url, None)
@@ -1,21 +1,34 @@
 from __future__ import annotations
 
 import asyncio
+import logging
+import time
+from itertools import islice
 from typing import TYPE_CHECKING, Any
 
 import msgspec
 
-from .better_lock import BetterLock
+from .compact_cache import memory_usage as _cache_memory_usage
+from .delta import diff_caches
 from .enums import IndexerName  # noqa: TC001 # for msgspec to resolve
+from .mmap_cache import MmapCache
+from .query_session import QuerySession
+from .search_index import SearchIndex
+from .single_flight import SingleFlight
 
 if TYPE_CHECKING:
-    from collections.abc import AsyncIterator
+    from collections.abc import AsyncIterator, Iterable
 
     from cidex.v2_1 import Cache, Entry
     from yarl import URL
 
+    from .cache_store import CacheStore
+    from .delta import CacheDelta
     from .indexers import Indexer
     from .manager import RtfmManager
+    from .snapshot import ManualSnapshot
+
+log = logging.getLogger(__name__)
 
 
 class PartialManual(msgspec.Struct):
@@ -23,6 +36,7 @@ class PartialManual(msgspec.Struct):
     type: IndexerName
     loc: str
     options: dict[str, Any] = msgspec.field(default_factory=dict)
+    query_count: int = 0
 
 
 class Manual:
@@ -42,9 +56,16 @@ class Manual:
         self.options = (
             self.manager.options.get("default_manual_options", {}).copy() or {}
         )
-        self.cache_lock = BetterLock()
+        self._refresh: SingleFlight[None, Cache] = SingleFlight()
 
         self.cache: Cache | None = None
+        self.search_index: SearchIndex | None = None
+        self.last_queried: float = 0
+        self.query_count = 0
+        self.last_refreshed: float | None = None
+        self.last_error: Exception | None = None
+        self._snapshot: ManualSnapshot | None = None
+        self.last_delta: CacheDelta | None = None
         if options:
             self.options.update(options)
 
@@ -52,6 +73,19 @@ class Manual:
     def is_api(self) -> bool:
         return self.indexer.make_request is not None
 
+    @property
+    def refreshing(self) -> bool:
+        return self._refresh.running(None)
+
+    @property
+    def memory_usage(self) -> int:
+        size = 0
+        if self.cache is not None:
+            size += _cache_memory_usage(self.cache)
+        if self.search_index is not None:
+            size += self.search_index.memory_usage()
+        return size
+
     @property
     def favicon_url(self) -> str | None:
         return self.indexer.favicon_url
@@ -71,35 +105,263 @@ class Manual:
 
     def to_partial(self) -> PartialManual:
         return PartialManual(
-            self.name, type=self.indexer.name, loc=str(self.loc), options=self.options
+            self.name,
+            type=self.indexer.name,
+            loc=str(self.loc),
+            options=self.options,
+            query_count=self.query_count,
         )
 
     async def refresh_cache(self) -> Cache:
-        if self.cache_lock.locked():
-            await self.cache_lock.wait()
+        # Every caller arriving during a rebuild shares it, getting its result or its
+        # exception, unless there is a cache to serve until the rebuild is done.
+        if self.cache is not None and self._refresh.running(None):
+            return self.cache
+        return await self._refresh.run(None, self._run_refresh)
+
+    async def _run_refresh(self) -> Cache:
+        try:
+            cache = await self._refresh_cache()
+        except Exception as e:
+            # the previous cache and index are only replaced once a build succeeds
+            self.last_error = e
             if self.cache is not None:
+                log.warning(
+                    "Unable to refresh the cache of %r, serving the previous one",
+                    self.name,
+                    exc_info=e,
+                )
+            raise
+
+        self.last_error = None
+        self.last_refreshed = time.time()
+        return cache
+
+    def load_snapshot(self, snapshot: ManualSnapshot, *, lazy: bool = True) -> None:
+        snapshot.restore(self)
+        if lazy:
+            self._snapshot = snapshot
+            return
+
+        decoded = snapshot.decode()
+        if decoded is not None:
+            self.cache, self.search_index = decoded
+            self.manager.query_cache.invalidate(self)
+
+    def revalidate(self) -> asyncio.Task[Cache]:
+        # Refreshes the cache in the background, queries keep using the current one
+        # until the new one is swapped in.
+        return self._refresh.start(None, self._run_refresh)
+
+    async def _refresh_cache(self) -> Cache:
+        if self.cache is None and self._snapshot is not None:
+            snapshot, self._snapshot = self._snapshot, None
+            try:
+                decoded = await asyncio.to_thread(snapshot.decode)
+            except msgspec.DecodeError as e:
+                log.warning("Unable to load the snapshot of %r", self.name, exc_info=e)
+                decoded = None
+
+            if decoded is not None:
+                self.cache, self.search_index = decoded
+                self.manager.query_cache.invalidate(self)
                 return self.cache
-            raise ValueError("Cache Lock was released, but cache was not filled")
 
-        async with self.cache_lock:
-            self.cache = await self.indexer.build_cache()
-            return self.cache
+        store: CacheStore | None = self.manager.options.get("cache_store")
+
+        # the store is only used for warm starts, reloads always go to the source
+        cache = None
+        if store is not None and (self.cache is None or store.read_only):
+            cache = await store.load(self)
+        built = cache is None
+
+        if cache is None:
+            cache = await self._build_cache()
+
+        if cache is self.cache:
+            # the source hasn't changed, everything derived from it is still valid
+            return cache
+
+        old = self.cache
+        delta = None
+        if self._is_diffable(old) and self._is_diffable(cache):
+            assert old is not None
+            delta = await asyncio.to_thread(diff_caches, old, cache)
+            if delta.empty:
+                # rebuilt, but identical, so it's as good as a 304
+                return old
+
+        if built and store is not None and not self.is_api:
+            try:
+                await store.save(self, cache)
+            except Exception as e:
+                log.warning("Unable to store the cache of %r", self.name, exc_info=e)
+
+        # mapped caches are searched directly, an index would copy every label
+        search_index = None
+        if not self.is_api and not isinstance(cache, MmapCache):
+            if (
+                delta is not None
+                and self.search_index is not None
+                and self.search_index.cache is old
+            ):
+                search_index = await asyncio.to_thread(
+                    self.search_index.apply, cache, delta
+                )
+            else:
+                search_index = await asyncio.to_thread(SearchIndex, cache)
+
+        self.cache, self.search_index = cache, search_index
+        self.last_delta = delta
+        if delta is None:
+            self.manager.query_cache.invalidate(self)
+            return cache
+
+        self.manager.query_cache.apply_delta(self, delta)
+        if (callback := self.manager.options.get("on_manual_changed")) is not None:
+            try:
+                callback(self, delta)
+            except Exception:
+                log.exception("on_manual_changed failed for %r", self.name)
+        return cache
+
+    def _is_diffable(self, cache: Cache | None) -> bool:
+        # api caches are always empty, and diffing a mapped cache would decode all of it
+        return (
+            cache is not None and not self.is_api and not isinstance(cache, MmapCache)
+        )
+
+    async def _build_cache(self) -> Cache:
+        metrics = self.manager.metrics
+        if metrics is None:
+            return await self.indexer.build_cache()
+
+        start = time.perf_counter()
+        try:
+            cache = await self.indexer.build_cache()
+        except Exception:
+            metrics.record("build", self.name, errors=1)
+            raise
+
+        metrics.record(
+            "build",
+            self.name,
+            seconds=time.perf_counter() - start,
+            entries=len(cache),
+        )
+        return cache
+
+    async def query(
+        self, text: str, *, limit: int | None = None
+    ) -> AsyncIterator[tuple[int, Entry]]:
+        self.last_queried = time.monotonic()
+        self.query_count += 1
+        metrics = self.manager.metrics
+        start = time.perf_counter()
+
+        if self.cache is None:
+            await self.refresh_cache()
+
+        query_cache = self.manager.query_cache
+        matches = query_cache.get(self, text, limit)
+        if matches is None:
+            # the cache might be replaced while the query runs
+            generation = query_cache.generation(self)
+            try:
+                matches = await self._run_query(text, limit)
+            except Exception:
+                if metrics is not None:
+                    metrics.record("query", self.name, errors=1)
+                raise
+            query_cache.put(self, text, limit, matches, generation=generation)
+
+        if metrics is not None:
+            metrics.record(
+                "query",
+                self.name,
+                seconds=time.perf_counter() - start,
+                results=len(matches),
+            )
+
+        for idx, match in enumerate(matches):
+            yield idx, match
+
+    async def query_many(
+        self, texts: Iterable[str], *, limit: int | None = None
+    ) -> list[list[Entry]]:
+        # Runs a batch of queries with a single hop to a thread, returning the results
+        # of every query in the same order as ``texts``.
+        texts = list(texts)
+        self.last_queried = time.monotonic()
+        self.query_count += 1
+        metrics = self.manager.metrics
+        start = time.perf_counter()
 
-    async def query(self, text: str) -> AsyncIterator[tuple[int, Entry]]:
         if self.cache is None:
-            self.cache = await self.refresh_cache()
+            await self.refresh_cache()
+
+        query_cache = self.manager.query_cache
+        results: dict[str, list[Entry]] = {}
+        missing: list[str] = []
+        for text in dict.fromkeys(texts):
+            matches = query_cache.get(self, text, limit)
+            if matches is None:
+                missing.append(text)
+            else:
+                results[text] = matches
+
+        if missing:
+            generation = query_cache.generation(self)
+            if self.is_api:
+                found = await asyncio.gather(
+                    *(self._run_query(text, limit) for text in missing)
+                )
+            else:
+                searchable = self.cache
+                if not isinstance(searchable, MmapCache):
+                    searchable = await self.get_search_index()
+                batches = await asyncio.to_thread(
+                    self.manager.fuzzy_search_many, missing, searchable, limit=limit
+                )
+                found = [[match for _, match in batch] for batch in batches]
+
+            for text, matches in zip(missing, found):
+                query_cache.put(self, text, limit, matches, generation=generation)
+                results[text] = matches
+
+        if metrics is not None:
+            metrics.record(
+                "query_many",
+                self.name,
+                seconds=time.perf_counter() - start,
+                queries=len(texts),
+            )
+        return [results[text] for text in texts]
 
+    async def _run_query(self, text: str, limit: int | None) -> list[Entry]:
         if self.indexer.make_request:
             cache = await self.indexer.make_request(text)
-            for idx, match in enumerate(cache.values()):
-                yield idx, match
-            return
+            return list(islice(cache.values(), limit))
 
-        assert self.cache
-        matches = await asyncio.to_thread(self.manager.fuzzy_search, text, self.cache)
+        searchable = self.cache
+        if not isinstance(searchable, MmapCache):
+            searchable = await self.get_search_index()
+        matches = await asyncio.to_thread(
+            list, self.manager.fuzzy_search(text, searchable, limit=limit)
+        )
+        return [match for _, match in matches]
 
-        for idx, (_, match) in enumerate(matches):
-            yield idx, match
+    async def get_search_index(self) -> SearchIndex:
+        if self.cache is None:
+            await self.refresh_cache()
+        assert self.cache is not None
+
+        if self.search_index is None or self.search_index.cache is not self.cache:
+            self.search_index = await asyncio.to_thread(SearchIndex, self.cache)
+        return self.search_index
+
+    def query_session(self) -> QuerySession:
+        return QuerySession(self)
 
     @property
     def icon_url(self) -> str:
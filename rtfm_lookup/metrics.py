@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    Listener = Callable[[str, str, dict[str, float]], object]
+
+__all__ = ("Metrics",)
+
+
+class Summary:
+    __slots__ = ("count", "last", "max", "sum")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class Metrics:
+    # Recorded values are aggregated per metric and per manual. The metric's name is
+    # ``<event>_<value>``, ex: ``fetch_seconds``, ``fetch_bytes`` or ``build_errors``.
+    # Nothing records anything unless a Metrics instance is passed to the manager
+    # through the ``metrics`` option, so there is no cost when it's disabled.
+
+    def __init__(self) -> None:
+        self._summaries: defaultdict[str, defaultdict[str, Summary]] = defaultdict(
+            lambda: defaultdict(Summary)
+        )
+        self._listeners: list[Listener] = []
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} metrics={len(self._summaries)} listeners={len(self._listeners)}>"
+
+    def add_listener(self, listener: Listener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener) -> None:
+        self._listeners.remove(listener)
+
+    def record(self, event: str, manual: str, **values: float) -> None:
+        for key, value in values.items():
+            self._summaries[f"{event}_{key}"][manual].add(value)
+
+        for listener in self._listeners:
+            listener(event, manual, values)
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, float]]]:
+        return {
+            metric: {manual: summary.to_dict() for manual, summary in manuals.items()}
+            for metric, manuals in self._summaries.items()
+        }
+
+    def reset(self) -> None:
+        self._summaries.clear()
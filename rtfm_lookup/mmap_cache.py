@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import msgspec
+from cidex.v2_1 import Entry
+from yarl import URL
+
+from .cache_store import DiskCacheStore
+from .compact_cache import CompactCache
+from .fuzzy import finder as _fuzzy_finder
+from .fuzzy import rank as _fuzzy_rank
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from cidex.v2_1 import Cache
+
+    from .manual import Manual
+
+__all__ = ("MmapCache", "MmapCacheStore")
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"RTFMMMAP"
+MMAP_VERSION = 1
+
+# magic, version, header length
+PREFIX = f"<{len(MAGIC)}sIQ"
+PREFIX_SIZE = len(MAGIC) + 4 + 8
+
+
+class MmapHeader(msgspec.Struct, array_like=True):
+    count: int
+    ascii: bool
+    base: str | None
+    favicon_url: str | None
+    option_table: list[dict[str, Any] | None]
+    # (offset, length) of every section, relative to the start of the file
+    labels: tuple[int, int]
+    label_offsets: tuple[int, int]
+    locations: tuple[int, int]
+    location_offsets: tuple[int, int]
+    option_ids: tuple[int, int]
+
+
+def _pack(values: list[bytes], *, separator: bytes = b"") -> tuple[bytes, bytes]:
+    offsets = array("Q", [0])
+    position = 0
+    for value in values:
+        position += len(value) + len(separator)
+        offsets.append(position)
+    return separator.join(values) + (separator if values else b""), offsets.tobytes()
+
+
+class MmapCache(Mapping[str, Entry]):
+    # A read-only cache backed by a memory-mapped file, so that every process on a
+    # host shares the same pages instead of holding its own copy of the cache.
+    # Labels are stored sorted and NUL separated in a single blob, which lookups
+    # bisect and the fuzzy search scans directly with a bytes regex. Python objects
+    # are only created for the entries that are actually looked up or returned.
+
+    __slots__ = (
+        "_label_offsets",
+        "_labels",
+        "_location_offsets",
+        "_locations",
+        "_mmap",
+        "_option_ids",
+        "base",
+        "favicon_url",
+        "header",
+        "identity",
+        "path",
+    )
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = Path(path)
+
+        with self.path.open("rb") as file:
+            stat = os.fstat(file.fileno())
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        if len(self._mmap) < PREFIX_SIZE:
+            raise ValueError(f"{self.path} is not a mmap cache")
+        magic, version, header_size = struct.unpack_from(PREFIX, self._mmap)
+        if magic != MAGIC or version != MMAP_VERSION:
+            raise ValueError(f"{self.path} is not a version {MMAP_VERSION} mmap cache")
+
+        view = memoryview(self._mmap)
+        self.header = header = msgspec.msgpack.decode(
+            view[PREFIX_SIZE : PREFIX_SIZE + header_size], type=MmapHeader
+        )
+        self.base = None if header.base is None else URL(header.base)
+        self.favicon_url = header.favicon_url
+
+        def section(bounds: tuple[int, int]) -> memoryview:
+            return view[bounds[0] : bounds[0] + bounds[1]]
+
+        self._labels = section(header.labels)
+        self._label_offsets = section(header.label_offsets).cast("Q")
+        self._locations = section(header.locations)
+        self._location_offsets = section(header.location_offsets).cast("Q")
+        self._option_ids = section(header.option_ids).cast("I")
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.path=} entries={len(self)}>"
+
+    @staticmethod
+    def write(
+        path: str | os.PathLike[str], cache: Cache, *, favicon_url: str | None = None
+    ) -> None:
+        # Written to a temporary file and moved into place, readers that already
+        # mapped the previous file keep using it until they reload.
+        if not isinstance(cache, CompactCache):
+            compact = CompactCache()
+            for label, entry in cache.items():
+                compact.add(label, entry.url, entry.options)
+            cache = compact
+
+        columns = cache.to_columns()
+        rows = sorted(
+            zip(
+                [label.encode() for label in columns.labels],
+                columns.locations,
+                array("I", columns.option_ids),
+            )
+        )
+        labels = [label for label, _, _ in rows]
+        if any(b"\0" in label for label in labels):
+            raise ValueError("Labels containing NUL characters can't be mapped")
+
+        label_blob, label_offsets = _pack(labels, separator=b"\0")
+        location_blob, location_offsets = _pack(
+            [location.encode() for _, location, _ in rows]
+        )
+        ids = array("I", [option_id for _, _, option_id in rows]).tobytes()
+
+        sections = [label_blob, label_offsets, location_blob, location_offsets, ids]
+
+        def layout(header_size: int) -> list[tuple[int, int]]:
+            bounds = []
+            offset = PREFIX_SIZE + header_size
+            for data in sections:
+                offset += -offset % 8  # keeps the offset arrays aligned
+                bounds.append((offset, len(data)))
+                offset += len(data)
+            return bounds
+
+        # the header's size depends on the offsets it contains, so it's re-encoded
+        # until the size stops changing
+        header_size = 0
+        while True:
+            header = msgspec.msgpack.encode(
+                MmapHeader(
+                    len(labels),
+                    label_blob.isascii(),
+                    columns.base,
+                    favicon_url,
+                    columns.option_table,
+                    *layout(header_size),
+                )
+            )
+            if len(header) == header_size:
+                break
+            header_size = len(header)
+
+        path = Path(path)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as file:
+            file.write(struct.pack(PREFIX, MAGIC, MMAP_VERSION, header_size))
+            file.write(header)
+            for (offset, _), data in zip(layout(header_size), sections):
+                file.write(b"\0" * (offset - file.tell()))
+                file.write(data)
+        os.replace(tmp, path)
+
+    def _label(self, row: int) -> str:
+        offsets = self._label_offsets
+        return str(self._labels[offsets[row] : offsets[row + 1] - 1], "utf-8")
+
+    def _find(self, label: str) -> int | None:
+        encoded = label.encode()
+        offsets, labels = self._label_offsets, self._labels
+
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = labels[offsets[mid] : offsets[mid + 1] - 1]
+            if current == encoded:
+                return mid
+            if current.tobytes() < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _entry(self, row: int, label: str) -> Entry:
+        offsets = self._location_offsets
+        location = str(self._locations[offsets[row] : offsets[row + 1]], "utf-8")
+        options = self.header.option_table[self._option_ids[row]]
+        return Entry(
+            label,
+            location if self.base is None else str(self.base / location),
+            options=dict(options or {}),
+        )
+
+    def __getitem__(self, label: str) -> Entry:
+        row = self._find(label)
+        if row is None:
+            raise KeyError(label)
+        return self._entry(row, label)
+
+    def __contains__(self, label: object) -> bool:
+        return isinstance(label, str) and self._find(label) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self._label, range(len(self)))
+
+    def __len__(self) -> int:
+        return self.header.count
+
+    def memory_usage(self) -> int:
+        # the mapped pages live in the page cache and are shared between processes
+        return sys.getsizeof(self.header.option_table)
+
+    def search(
+        self, text: str, *, limit: int | None = None
+    ) -> Iterator[tuple[str, Entry]]:
+        if not (text.isascii() and self.header.ascii) or "\0" in text:
+            # bytes patterns only fold ascii, so anything else goes through the
+            # regular finder and its unicode aware regex
+            for label in _fuzzy_finder(text, self, limit=limit):
+                yield label, self[label]
+            return
+
+        # the same pattern as the fuzzy finder, except that it can't run past the end
+        # of a label into the next one
+        pattern = b"[^\\0\\n]*?".join(re.escape(bytes([c])) for c in text.encode())
+        regex = re.compile(pattern, flags=re.IGNORECASE)
+
+        offsets, labels = self._label_offsets, self._labels
+        end = len(labels)
+        suggestions: list[tuple[int, int, str, int, int]] = []
+
+        # an empty pattern also matches at ``end``, past the last label
+        position = 0
+        while position < end and (match := regex.search(labels, position, end)):
+            row = bisect_right(offsets, match.start()) - 1
+            start = offsets[row]
+            suggestions.append(
+                (
+                    match.end() - match.start(),
+                    match.start() - start,
+                    self._label(row),
+                    row,
+                    row,
+                )
+            )
+            # only the leftmost match of every label counts, like ``re.search``
+            position = offsets[row + 1]
+
+        for row in _fuzzy_rank(suggestions, limit=limit):
+            label = self._label(row)
+            yield label, self._entry(row, label)
+
+
+class MmapCacheStore(DiskCacheStore):
+    # Meant to be shared by every process on a host: a single builder process is
+    # created with ``read_only=False`` and writes the caches, while readers map them
+    # on every refresh instead of going to the source.
+
+    suffix = ".rtfmmap"
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        read_only: bool = True,
+        ttl: float | None = None,
+        max_size: int | None = None,
+    ) -> None:
+        super().__init__(path, ttl=ttl, max_size=max_size)
+        self.read_only = read_only
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.path=} {self.read_only=}>"
+
+    def _open(self, file: Path, current: Cache | None) -> MmapCache | None:
+        try:
+            stat = file.stat()
+            if (
+                isinstance(current, MmapCache)
+                and current.path == file
+                and current.identity == (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            ):
+                return current
+            if self._is_expired(stat) and not self.read_only:
+                return None
+            return MmapCache(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, msgspec.DecodeError) as e:
+            log.debug("Unable to map cache file %s", file, exc_info=e)
+            return None
+
+    async def load(self, manual: Manual) -> Cache | None:
+        cache = await asyncio.to_thread(self._open, self.file_for(manual), manual.cache)
+        if cache is not None:
+            manual.indexer.favicon_url = cache.favicon_url
+        return cache
+
+    def _write(self, file: Path, cache: Cache, favicon_url: str | None) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        MmapCache.write(file, cache, favicon_url=favicon_url)
+        self.evict()
+
+    async def save(self, manual: Manual, cache: Cache) -> None:
+        if self.read_only or isinstance(cache, MmapCache):
+            return
+        await asyncio.to_thread(
+            self._write, self.file_for(manual), cache, manual.favicon_url
+        )
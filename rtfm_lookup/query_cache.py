@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import time
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from .fuzzy import score as _fuzzy_score
+
+if TYPE_CHECKING:
+    from cidex.v2_1 import Entry
+
+    from .delta import CacheDelta
+    from .manual import Manual
+
+__all__ = ("QueryCache",)
+
+QueryKey = tuple["Manual", str, int | None]
+
+
+class QueryCache:
+    def __init__(
+        self,
+        *,
+        maxsize: int = 1024,
+        ttl: float | None = 300,
+        max_results: int | None = 1000,
+        max_delta: int = 1000,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_results = max_results
+        self.max_delta = max_delta
+
+        self.hits = 0
+        self.misses = 0
+        self._results: OrderedDict[QueryKey, tuple[float, list[Entry]]] = OrderedDict()
+        # bumped whenever a manual's results are invalidated, so that results computed
+        # against its previous cache aren't stored once it has been replaced
+        self._epoch = 0
+        self._generations: weakref.WeakKeyDictionary[Manual, int] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.maxsize=} {self.ttl=} size={len(self)} {self.hits=} {self.misses=}>"
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def _key(self, manual: Manual, text: str, limit: int | None) -> QueryKey:
+        # fuzzy matching is case insensitive, api manuals might not be
+        if text.isascii() and not manual.is_api:
+            text = text.lower()
+        return manual, text, limit
+
+    def get(self, manual: Manual, text: str, limit: int | None) -> list[Entry] | None:
+        if not self.enabled:
+            return None
+
+        key = self._key(manual, text, limit)
+        cached = self._results.get(key)
+        if cached is None or (
+            self.ttl is not None and time.monotonic() - cached[0] > self.ttl
+        ):
+            self._results.pop(key, None)
+            self.misses += 1
+            return None
+
+        self._results.move_to_end(key)
+        self.hits += 1
+        return cached[1]
+
+    def generation(self, manual: Manual) -> tuple[int, int]:
+        return self._epoch, self._generations.get(manual, 0)
+
+    def put(
+        self,
+        manual: Manual,
+        text: str,
+        limit: int | None,
+        results: list[Entry],
+        *,
+        generation: tuple[int, int] | None = None,
+    ) -> None:
+        if (
+            not self.enabled
+            or (self.max_results is not None and len(results) > self.max_results)
+            or (generation is not None and generation != self.generation(manual))
+        ):
+            return
+
+        key = self._key(manual, text, limit)
+        self._results[key] = (time.monotonic(), results)
+        self._results.move_to_end(key)
+
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def _bump(self, manual: Manual) -> None:
+        self._generations[manual] = self._generations.get(manual, 0) + 1
+
+    def invalidate(self, manual: Manual | None = None) -> None:
+        if manual is None:
+            self._epoch += 1
+            self._generations.clear()
+            self._results.clear()
+            return
+
+        self._bump(manual)
+        for key in [key for key in self._results if key[0] is manual]:
+            del self._results[key]
+
+    def apply_delta(self, manual: Manual, delta: CacheDelta) -> None:
+        # A query's results can only change if one of the labels that changed matches
+        # it, every other cached result is still valid. Past a point it's cheaper to
+        # drop everything than to check every label against every cached query.
+        labels = delta.labels
+        if manual.is_api or len(labels) > self.max_delta:
+            return self.invalidate(manual)
+
+        self._bump(manual)
+        for key in [key for key in self._results if key[0] is manual]:
+            if any(_fuzzy_score(key[1], labels)):
+                del self._results[key]
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+from .mmap_cache import MmapCache
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from cidex.v2_1 import Entry
+
+    from .manual import Manual
+    from .search_index import SearchIndex
+
+__all__ = ("QuerySession",)
+
+
+class QuerySession:
+    # Meant for type-ahead, where every query extends the previous one. Anything
+    # matching "async" also matches "asyn", so only the previous matches get rescanned.
+
+    def __init__(self, manual: Manual) -> None:
+        self.manual = manual
+
+        self._text: str | None = None
+        self._index: SearchIndex | None = None
+        self._matched: list[str] | None = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.manual=} {self._text=}>"
+
+    def reset(self) -> None:
+        self._text = self._index = self._matched = None
+
+    def _extends_previous(self, text: str) -> bool:
+        if self._text is None:
+            return False
+        if text.isascii() and self._text.isascii():
+            return text.lower().startswith(self._text.lower())
+        return text.startswith(self._text)
+
+    async def query(
+        self, text: str, *, limit: int | None = None
+    ) -> AsyncIterator[tuple[int, Entry]]:
+        manual = self.manual
+        if manual.cache is None:
+            await manual.refresh_cache()
+
+        if manual.is_api or isinstance(manual.cache, MmapCache):
+            async for result in manual.query(text, limit=limit):
+                yield result
+            return
+
+        manual.last_queried = time.monotonic()
+        manual.query_count += 1
+        start = time.perf_counter()
+        index = await manual.get_search_index()
+
+        keys = None
+        if index is self._index and self._extends_previous(text):
+            keys = self._matched
+
+        self._matched, ranked = await asyncio.to_thread(
+            index.refine, text, keys, limit=limit
+        )
+        self._text, self._index = text, index
+
+        if (metrics := manual.manager.metrics) is not None:
+            metrics.record(
+                "query",
+                manual.name,
+                seconds=time.perf_counter() - start,
+                results=len(ranked),
+            )
+
+        for idx, key in enumerate(ranked):
+            yield idx, index.cache[key]
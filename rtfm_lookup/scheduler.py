@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+import msgspec
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .manual import Manual
+
+__all__ = ("ReloadResult", "ReloadScheduler")
+
+log = logging.getLogger(__name__)
+
+
+class ReloadResult(msgspec.Struct):
+    name: str
+    duration: float
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ReloadScheduler:
+    def __init__(self, *, concurrency: int = 8, per_host: int | None = 2) -> None:
+        self.concurrency = concurrency
+        self.per_host = per_host
+
+        # shared between runs, so overlapping reloads still respect the limits
+        self._limit = asyncio.Semaphore(concurrency)
+        self._host_limits: defaultdict[str | None, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(per_host or concurrency)
+        )
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.concurrency=} {self.per_host=}>"
+
+    def prioritize(self, manuals: Iterable[Manual]) -> list[Manual]:
+        return sorted(manuals, key=lambda man: man.last_queried, reverse=True)
+
+    def _host(self, manual: Manual) -> str | None:
+        # the host the index is downloaded from, which isn't always the manual's, ex:
+        # every manual of the shared rtfm indexes repo is downloaded from github
+        url = manual.indexer.probe_url()
+        return manual.loc.host if url is None else url.host
+
+    async def _reload(self, manual: Manual) -> ReloadResult:
+        async with self._host_limits[self._host(manual)], self._limit:
+            start = time.perf_counter()
+            try:
+                await manual.refresh_cache()
+            except Exception as e:
+                log.debug("Unable to reload %r", manual.name, exc_info=e)
+                return ReloadResult(manual.name, time.perf_counter() - start, e)
+            return ReloadResult(manual.name, time.perf_counter() - start)
+
+    async def run(self, manuals: Iterable[Manual]) -> list[ReloadResult]:
+        # semaphores wake their waiters in order, so creating the tasks by priority is
+        # enough for the important manuals to be reloaded first
+        return await asyncio.gather(
+            *(self._reload(man) for man in self.prioritize(manuals))
+        )
+
+    async def prewarm(
+        self, manuals: Iterable[Manual], *, concurrency: int = 2
+    ) -> list[ReloadResult]:
+        # Loads manuals the most queried first, on top of the usual limits. A manual that
+        # got loaded by a query while it was waiting for its turn is skipped.
+        limit = asyncio.Semaphore(concurrency)
+
+        async def load(manual: Manual) -> ReloadResult | None:
+            async with limit:
+                if manual.cache is not None:
+                    return None
+                return await self._reload(manual)
+
+        ordered = sorted(
+            manuals, key=lambda man: (man.query_count, man.last_queried), reverse=True
+        )
+        results = await asyncio.gather(*(load(man) for man in ordered))
+        return [result for result in results if result is not None]
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import sys
+from itertools import compress
+from typing import TYPE_CHECKING
+
+import msgspec
+
+from .fuzzy import finder as _fuzzy_finder
+from .fuzzy import rank as _fuzzy_rank
+from .fuzzy import score as _fuzzy_score
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from cidex.v2_1 import Cache, Entry
+
+    from .delta import CacheDelta
+
+__all__ = ("SearchIndex",)
+
+
+class IndexColumns(msgspec.Struct, array_like=True):
+    size: int
+    chars: dict[str, bytes]
+    always: bytes
+
+
+class SearchIndex:
+    # For every ascii character we keep a bitset (one byte per key, stored as an int so
+    # that intersecting them is a single C-level ``&``) of the keys containing it.
+    # A key can only match a query if it contains every character of the query, so
+    # only the keys that survive the intersection are handed to the fuzzy finder.
+    # Keys with non-ascii characters are always scanned, since ``re.IGNORECASE``
+    # folds some non-ascii characters onto ascii ones (ex: the kelvin sign and ``k``).
+
+    __slots__ = (
+        "_always",
+        "_chars",
+        "_dead",
+        "_everything",
+        "_patched",
+        "cache",
+        "keys",
+    )
+
+    def __init__(self, cache: Cache) -> None:
+        self.cache = cache
+        self.keys: list[str] = list(cache.keys())
+        self._chars, self._always = _bitsets(self.keys)
+        self._everything = int.from_bytes(b"\x01" * len(self.keys), "little")
+        self._dead = 0
+        self._patched = False
+
+    def __len__(self) -> int:
+        return len(self.keys) - self._dead
+
+    def apply(self, cache: Cache, delta: CacheDelta) -> SearchIndex:
+        # Returns an index of ``cache`` derived from this one, which keeps serving the
+        # old cache untouched. Added keys are appended and removed ones are only masked
+        # out, so it's rebuilt from scratch once they make up a quarter of the keys.
+        if (self._dead + len(delta.removed)) * 4 > len(self.keys) + len(delta.added):
+            return SearchIndex(cache)
+
+        dead = 0
+        if delta.removed:
+            removed = set(delta.removed)
+            for idx, key in enumerate(self.keys):
+                if key in removed:
+                    dead |= 1 << (idx * 8)
+        live = ~dead
+
+        offset = len(self.keys) * 8
+        chars, always = _bitsets(delta.added)
+
+        new = SearchIndex.__new__(SearchIndex)
+        new.cache = cache
+        new.keys = self.keys + delta.added
+        new._chars = {
+            char: (self._chars.get(char, 0) & live) | (chars.get(char, 0) << offset)
+            for char in self._chars.keys() | chars.keys()
+        }
+        new._always = (self._always & live) | (always << offset)
+        new._everything = (self._everything & live) | (
+            int.from_bytes(b"\x01" * len(delta.added), "little") << offset
+        )
+        new._dead = self._dead + len(delta.removed)
+        new._patched = True
+        return new
+
+    def to_columns(self) -> IndexColumns | None:
+        # stored bitsets have to follow the cache's order, which patched indexes don't
+        if self._patched:
+            return None
+
+        size = len(self.keys)
+        return IndexColumns(
+            size,
+            {char: mask.to_bytes(size, "little") for char, mask in self._chars.items()},
+            self._always.to_bytes(size, "little"),
+        )
+
+    @classmethod
+    def from_columns(cls, cache: Cache, columns: IndexColumns) -> SearchIndex:
+        # the bitsets follow the order of the cache's keys, which is kept by both
+        # CompactCache and plain dicts
+        if columns.size != len(cache):
+            return cls(cache)
+
+        self = cls.__new__(cls)
+        self.cache = cache
+        self.keys = list(cache.keys())
+        self._chars = {
+            char: int.from_bytes(mask, "little") for char, mask in columns.chars.items()
+        }
+        self._always = int.from_bytes(columns.always, "little")
+        self._everything = int.from_bytes(b"\x01" * columns.size, "little")
+        self._dead = 0
+        self._patched = False
+        return self
+
+    def memory_usage(self) -> int:
+        # the keys themselves are shared with the cache
+        return sys.getsizeof(self.keys) + sum(
+            map(sys.getsizeof, (self._always, self._everything, *self._chars.values()))
+        )
+
+    def _mask(self, text: str) -> int:
+        mask = self._everything
+        for char in set(text):
+            if char.isascii():
+                mask &= self._chars.get(char.lower(), 0)
+        return mask | self._always
+
+    def _keys(self, mask: int) -> list[str]:
+        if mask == self._everything and not self._dead:
+            return self.keys
+        return list(compress(self.keys, mask.to_bytes(len(self.keys), "little")))
+
+    def candidates(self, text: str) -> list[str]:
+        return self._keys(self._mask(text))
+
+    def search(
+        self, text: str, *, limit: int | None = None
+    ) -> Iterator[tuple[str, Entry]]:
+        cache = self.cache
+        for key in _fuzzy_finder(text, self.candidates(text), limit=limit):
+            yield key, cache[key]
+
+    def search_many(
+        self, texts: Iterable[str], *, limit: int | None = None
+    ) -> list[list[tuple[str, Entry]]]:
+        # Every key matching a query also matches the queries it extends, ex: a key
+        # matching ``asynclock`` matches ``async`` and ``alk`` too. Queries are scored
+        # shortest first, each against the smaller of its candidates and the matches
+        # of a query it extends, so related queries (ex: type-ahead) share their scans.
+        # Entries are only looked up once per batch, however many queries return them.
+        texts = list(texts)
+        matches: dict[str, list[str]] = {}
+        results: dict[str, list[tuple[str, Entry]]] = {}
+        entries: dict[str, Entry] = {}
+        cache = self.cache
+
+        for text in sorted(dict.fromkeys(texts), key=len):
+            mask = self._mask(text)
+            keys = None
+            # gaps can't span newlines, skipping one of them doesn't keep a key matching
+            shared = text.isascii() and "\n" not in text
+            if shared:
+                # ``bit_count`` is the number of candidates, without listing them
+                size = mask.bit_count()
+                for other in _extended(text, matches):
+                    if len(matches[other]) < size:
+                        keys, size = matches[other], len(matches[other])
+
+            matched, ranked = self.refine(
+                text, self._keys(mask) if keys is None else keys, limit=limit
+            )
+            if shared:
+                matches[text] = matched
+            for key in ranked:
+                if key not in entries:
+                    entries[key] = cache[key]
+            results[text] = [(key, entries[key]) for key in ranked]
+        return [results[text] for text in texts]
+
+    def refine(
+        self, text: str, keys: list[str] | None = None, *, limit: int | None = None
+    ) -> tuple[list[str], list[str]]:
+        # Returns every key matching ``text`` alongside the ranked results. Whatever
+        # matches an extension of ``text`` is among those keys, so they can be passed
+        # back in as ``keys`` to narrow the next search down.
+        suggestions = list(
+            _fuzzy_score(text, self.candidates(text) if keys is None else keys)
+        )
+        matched = [key for *_, key in suggestions]
+        return matched, _fuzzy_rank(suggestions, limit=limit)
+
+
+def _extended(text: str, others: Iterable[str]) -> Iterator[str]:
+    # the ascii queries ``text`` extends, whose characters all appear in it in order
+    lowered = text.lower()
+    chars = set(lowered)
+    for other in others:
+        if len(other) < len(text) and chars.issuperset(other.lower()):
+            remaining = iter(lowered)
+            if all(char in remaining for char in other.lower()):
+                yield other
+
+
+def _bitsets(keys: list[str]) -> tuple[dict[str, int], int]:
+    size = len(keys)
+    columns: dict[str, bytearray] = {}
+    always = bytearray(size)
+
+    for idx, key in enumerate(keys):
+        if not key.isascii():
+            always[idx] = 1
+            continue
+
+        for char in set(key.lower()):
+            column = columns.get(char)
+            if column is None:
+                column = columns[char] = bytearray(size)
+            column[idx] = 1
+
+    chars = {char: int.from_bytes(column, "little") for char, column in columns.items()}
+    return chars, int.from_bytes(always, "little")
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Hashable
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+__all__ = ("SingleFlight",)
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[K, T]):
+    # Concurrent calls for the same key share a single task, and every caller gets its
+    # result or exception. Callers await it through a shield, so one of them being
+    # cancelled doesn't cancel it for everyone else, and it runs to completion even if
+    # all of them are. The task is forgotten once it's done, the next call starts anew.
+
+    def __init__(self) -> None:
+        self._tasks: dict[K, asyncio.Task[T]] = {}
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} running={len(self._tasks)}>"
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def running(self, key: K) -> bool:
+        return key in self._tasks
+
+    def start(self, key: K, func: Callable[[], Awaitable[T]]) -> asyncio.Task[T]:
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return task
+
+    async def run(self, key: K, func: Callable[[], Awaitable[T]]) -> T:
+        return await asyncio.shield(self.start(key, func))
+
+    def _finished(self, key: K, task: asyncio.Task[Any]) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+        # every caller might have been cancelled, which would leave it unretrieved
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+import msgspec
+from cidex.v2_1 import Entry
+from yarl import URL
+
+from .compact_cache import CacheColumns, CompactCache
+from .indexers.cidex import _CidexIndexerBase
+from .manual import PartialManual  # noqa: TC001 # for msgspec to resolve
+from .search_index import IndexColumns, SearchIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from cidex.v2_1 import Cache
+
+    from .manual import Manual
+
+__all__ = ("ManualSnapshot", "Snapshot", "SnapshotVersionError")
+
+SNAPSHOT_VERSION = 1
+
+CachePayload = CacheColumns | dict[str, Entry]
+
+cache_decoder = msgspec.msgpack.Decoder(type=CachePayload | None)
+index_decoder = msgspec.msgpack.Decoder(type=IndexColumns | None)
+encoder = msgspec.msgpack.Encoder()
+
+# msgspec.Raw can't be optional, an encoded ``None`` stands in for a missing cache
+NOTHING = msgspec.Raw(encoder.encode(None))
+
+
+class SnapshotVersionError(ValueError):
+    def __init__(self, version: int) -> None:
+        super().__init__(
+            f"Unsupported snapshot version {version}, expected {SNAPSHOT_VERSION}"
+        )
+        self.version = version
+
+
+class ManualSnapshot(msgspec.Struct, array_like=True):
+    # The cache and index are kept as raw msgpack, which references the buffer the
+    # snapshot was decoded from, so they are only decoded once the manual is used.
+
+    manual: PartialManual
+    favicon_url: str | None
+    built_at: float | None
+    validators: list[tuple[str, str | None, str | None]]
+    cache: msgspec.Raw = NOTHING
+    index: msgspec.Raw = NOTHING
+    # the cidex manifest url and the variant resolved from it, which its validators
+    # were stored with
+    variant: tuple[str, str] | None = None
+
+    @classmethod
+    def from_manual(cls, manual: Manual, *, index: bool = False) -> ManualSnapshot:
+        cache = manual.cache
+        if cache is None or manual.is_api:
+            # api manuals need the index to be fetched anyways, to know where to query
+            return cls(manual.to_partial(), manual.favicon_url, None, [])
+
+        payload = cache.to_columns() if isinstance(cache, CompactCache) else dict(cache)
+        raw_index = NOTHING
+        if index and manual.search_index is not None:
+            # ``None`` when the index can't be stored, it's rebuilt on load instead
+            raw_index = msgspec.Raw(encoder.encode(manual.search_index.to_columns()))
+
+        return cls(
+            manual.to_partial(),
+            manual.favicon_url,
+            manual.last_refreshed,
+            [
+                (str(url), etag, last_modified)
+                for url, (etag, last_modified) in manual.indexer._validators.items()
+            ],
+            msgspec.Raw(encoder.encode(payload)),
+            raw_index,
+            _variant_of(manual),
+        )
+
+    def decode(self) -> tuple[Cache, SearchIndex] | None:
+        payload = cache_decoder.decode(self.cache)
+        if payload is None:
+            return None
+
+        cache = (
+            CompactCache.from_columns(payload)
+            if isinstance(payload, CacheColumns)
+            else payload
+        )
+
+        columns = index_decoder.decode(self.index)
+        if columns is None:
+            return cache, SearchIndex(cache)
+        return cache, SearchIndex.from_columns(cache, columns)
+
+    def restore(self, manual: Manual) -> None:
+        manual.indexer.favicon_url = self.favicon_url
+        manual.last_refreshed = self.built_at
+        manual.indexer._validators.update(
+            (URL(url), (etag, last_modified))
+            for url, etag, last_modified in self.validators
+        )
+        if self.variant is not None and isinstance(manual.indexer, _CidexIndexerBase):
+            manual.indexer._variant = (URL(self.variant[0]), URL(self.variant[1]))
+
+
+def _variant_of(manual: Manual) -> tuple[str, str] | None:
+    indexer = manual.indexer
+    if isinstance(indexer, _CidexIndexerBase) and indexer._variant is not None:
+        return str(indexer._variant[0]), str(indexer._variant[1])
+    return None
+
+
+class Snapshot(msgspec.Struct):
+    version: int
+    created_at: float
+    manuals: list[ManualSnapshot]
+
+    @classmethod
+    def from_manuals(
+        cls, manuals: Iterable[Manual], *, indexes: bool = False
+    ) -> Snapshot:
+        return cls(
+            SNAPSHOT_VERSION,
+            time.time(),
+            [ManualSnapshot.from_manual(man, index=indexes) for man in manuals],
+        )
+
+    def encode(self) -> bytes:
+        return encoder.encode(self)
+
+    @classmethod
+    def decode(cls, data: bytes | memoryview) -> Snapshot:
+        # checked before decoding the rest, older layouts might not decode at all
+        header = msgspec.msgpack.decode(data, type=_SnapshotHeader)
+        if header.version != SNAPSHOT_VERSION:
+            raise SnapshotVersionError(header.version)
+        return msgspec.msgpack.decode(data, type=cls)
+
+
+class _SnapshotHeader(msgspec.Struct):
+    version: int
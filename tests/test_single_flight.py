@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pytest
+from cidex.v2_1 import Entry
+from yarl import URL
+
+from rtfm_lookup import Manual, RtfmManager, SingleFlight
+from rtfm_lookup.enums import IndexerName
+from rtfm_lookup.indexers import indexers
+
+if TYPE_CHECKING:
+    from cidex.v2_1 import Cache
+
+CALLERS = 500
+
+
+class Build:
+    # Stands in for a source, every call counts as a build and waits until released.
+
+    def __init__(self, *, error: Exception | None = None) -> None:
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def __call__(self) -> Cache:
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {
+            label: Entry(label, f"https://docs/{label}.html")
+            for label in ("alpha", "beta", "gamma")
+        }
+
+
+async def gather_callers(
+    calls: list[asyncio.Task], build: Build
+) -> list[object | BaseException]:
+    # cancels every fourth caller while the build is running, then lets it finish
+    await build.started.wait()
+    for task in calls[::4]:
+        task.cancel()
+    await asyncio.sleep(0)
+    build.release.set()
+    return await asyncio.gather(*calls, return_exceptions=True)
+
+
+def make_manual(manager: RtfmManager, build: Build) -> Manual:
+    manual = Manual(
+        "test",
+        URL("https://docs/"),
+        indexer=indexers[IndexerName.intersphinx],
+        manager=manager,
+    )
+    manual.indexer.build_cache = build
+    return manual
+
+
+def test_single_flight_shares_result():
+    async def main():
+        flight: SingleFlight[str, Cache] = SingleFlight()
+        build = Build()
+        calls = [asyncio.create_task(flight.run("key", build)) for _ in range(CALLERS)]
+        results = await gather_callers(calls, build)
+
+        assert build.calls == 1
+        assert len(flight) == 0
+        for idx, result in enumerate(results):
+            if idx % 4 == 0:
+                assert isinstance(result, asyncio.CancelledError)
+            else:
+                assert result is results[1]
+
+    asyncio.run(main())
+
+
+def test_single_flight_shares_exception():
+    async def main():
+        flight: SingleFlight[str, Cache] = SingleFlight()
+        error = ValueError("build failed")
+        build = Build(error=error)
+        calls = [asyncio.create_task(flight.run("key", build)) for _ in range(CALLERS)]
+        results = await gather_callers(calls, build)
+
+        assert build.calls == 1
+        for idx, result in enumerate(results):
+            if idx % 4 != 0:
+                assert result is error
+
+    asyncio.run(main())
+
+
+def test_single_flight_survives_every_caller_cancelled():
+    async def main():
+        flight: SingleFlight[str, Cache] = SingleFlight()
+        build = Build()
+        calls = [asyncio.create_task(flight.run("key", build)) for _ in range(10)]
+        await build.started.wait()
+        task = flight.start("key", build)
+        for call in calls:
+            call.cancel()
+        await asyncio.gather(*calls, return_exceptions=True)
+
+        assert flight.running("key")
+        build.release.set()
+        assert await task == await flight.run("key", build)
+        assert build.calls == 2
+
+    asyncio.run(main())
+
+
+def test_refresh_cache_builds_once():
+    async def main():
+        manager = RtfmManager()
+        build = Build()
+        manual = make_manual(manager, build)
+        calls = [asyncio.create_task(manual.refresh_cache()) for _ in range(CALLERS)]
+        results = await gather_callers(calls, build)
+
+        assert build.calls == 1
+        assert not manual.refreshing
+        for idx, result in enumerate(results):
+            if idx % 4 == 0:
+                assert isinstance(result, asyncio.CancelledError)
+            else:
+                assert result is manual.cache
+
+    asyncio.run(main())
+
+
+def test_refresh_cache_shares_exception():
+    async def main():
+        manager = RtfmManager()
+        error = ValueError("build failed")
+        build = Build(error=error)
+        manual = make_manual(manager, build)
+        calls = [asyncio.create_task(manual.refresh_cache()) for _ in range(CALLERS)]
+        results = await gather_callers(calls, build)
+
+        assert build.calls == 1
+        assert manual.cache is None
+        assert manual.last_error is error
+        for idx, result in enumerate(results):
+            if idx % 4 != 0:
+                assert result is error
+
+        # the failure isn't remembered, the next caller builds again
+        build.error = None
+        assert await manual.refresh_cache() is manual.cache
+        assert build.calls == 2
+        assert manual.last_error is None
+
+    asyncio.run(main())
+
+
+def test_queries_share_cold_build():
+    async def main():
+        manager = RtfmManager()
+        build = Build()
+        manual = make_manual(manager, build)
+
+        async def query() -> list[str]:
+            return [entry.text async for _, entry in manual.query("a")]
+
+        calls = [asyncio.create_task(query()) for _ in range(CALLERS)]
+        results = await gather_callers(calls, build)
+
+        assert build.calls == 1
+        expected = results[1]
+        assert expected
+        for idx, result in enumerate(results):
+            if idx % 4 != 0:
+                assert result == expected
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_revalidate_serves_previous_cache(cached: bool):
+    async def main():
+        manager = RtfmManager()
+        build = Build()
+        manual = make_manual(manager, build)
+        if cached:
+            build.release.set()
+            previous = await manual.refresh_cache()
+            build.release.clear()
+            build.started.clear()
+
+        task = manual.revalidate()
+        await build.started.wait()
+        if cached:
+            # a rebuild is running, callers get the cache being replaced right away
+            assert await manual.refresh_cache() is previous
+        else:
+            waiter = asyncio.create_task(manual.refresh_cache())
+            await asyncio.sleep(0)
+            assert not waiter.done()
+
+        build.release.set()
+        assert await task is manual.cache
+        if not cached:
+            assert await waiter is manual.cache
+
+    asyncio.run(main())